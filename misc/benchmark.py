@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the read/write/convert/draw hot paths of pdroot.
+
+Synthetic flat and NanoAOD-like jagged trees are generated locally
+at a few sizes, and each benchmark reports wall time, throughput
+(events/s and MB/s) and peak memory (RSS high-water mark above
+the level at the start of the benchmark).
+
+    # run and print a table
+    python misc/benchmark.py --sizes 10000,100000
+
+    # save results, then compare a later run against them
+    python misc/benchmark.py --save baseline.json
+    python misc/benchmark.py --compare baseline.json --tolerance 0.2
+
+With `--compare`, the exit code is non-zero if any benchmark is slower
+than the baseline by more than `tolerance` (fractionally), which makes it
+usable as a regression check when upgrading awkward/uproot/pyarrow.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tempfile
+import platform
+import threading
+
+import numpy as np
+import pandas as pd
+
+import awkward1
+
+import pdroot
+from pdroot.readwrite import array_to_arrow_or_numpy, awkward1_arrays_to_dataframe
+
+
+def jagged_array(counts, content):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    layout = awkward1.layout.ListOffsetArray64(
+        awkward1.layout.Index64(offsets), awkward1.layout.NumpyArray(content)
+    )
+    return awkward1.Array(layout)
+
+
+def make_flat(nevents, ncolumns=8, seed=42):
+    rng = np.random.RandomState(seed)
+    columns = {f"x{i}": rng.normal(0, 1, nevents) for i in range(ncolumns)}
+    columns["i0"] = rng.randint(0, 10, nevents)
+    return pd.DataFrame(columns)
+
+
+def make_nano(nevents, seed=42):
+    """
+    NanoAOD-like content: a few jagged collections (Jet, Muon) with
+    pt/eta/phi/mass each, plus event-level branches.
+    """
+    rng = np.random.RandomState(seed)
+    arrays = dict()
+    for name, mean in [("Jet", 5.0), ("Muon", 1.0)]:
+        counts = rng.poisson(mean, nevents)
+        n = counts.sum()
+        pt = rng.exponential(30.0, n) + 5.0
+        arrays[f"{name}_pt"] = jagged_array(counts, pt.astype(np.float32))
+        arrays[f"{name}_eta"] = jagged_array(
+            counts, rng.uniform(-3, 3, n).astype(np.float32)
+        )
+        arrays[f"{name}_phi"] = jagged_array(
+            counts, rng.uniform(-np.pi, np.pi, n).astype(np.float32)
+        )
+        arrays[f"{name}_mass"] = jagged_array(
+            counts, rng.exponential(5.0, n).astype(np.float32)
+        )
+    arrays["MET_pt"] = rng.exponential(50.0, nevents).astype(np.float32)
+    arrays["run"] = np.sort(rng.randint(300000, 300010, nevents)).astype(np.int32)
+    arrays["luminosityBlock"] = rng.randint(1, 1000, nevents).astype(np.int32)
+    arrays["event"] = np.arange(nevents, dtype=np.int64)
+    return awkward1_arrays_to_dataframe(awkward1.zip(arrays, depth_limit=1))
+
+
+class PeakMemory:
+    """
+    Tracks the peak resident set size (above the starting level) while active,
+    by polling /proc/self/statm from a background thread. This catches
+    allocations made by numpy, arrow and awkward's C++ kernels alike.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._pagesize = os.sysconf("SC_PAGE_SIZE")
+
+    def _rss(self):
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * self._pagesize
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss() - self.start)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        gc.collect()
+        self.start = self._rss()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss() - self.start)
+
+
+def frame_nbytes(df):
+    nbytes = 0
+    for column in df.columns:
+        values = df[column].values
+        nbytes += getattr(values, "nbytes", 0)
+    return nbytes
+
+
+def benchmarks(workdir, kind, df):
+    """
+    Returns list of (name, function, nbytes) where `function` is the timed
+    callable and `nbytes` is the amount of data it processes (for MB/s).
+    """
+    fname = os.path.join(workdir, f"{kind}_{len(df)}.root")
+    df.to_root(fname, treename="t")
+    fsize = os.path.getsize(fname)
+    mbytes = frame_nbytes(df)
+
+    out = [
+        ("to_root", lambda: df.to_root(fname + ".tmp", treename="t"), mbytes),
+        ("read_root", lambda: pd.read_root(fname, treename="t"), fsize),
+        (
+            "iter_chunks",
+            lambda: sum(
+                len(x) for x in pdroot.iter_chunks(fname, treename="t", progress=False)
+            ),
+            fsize,
+        ),
+    ]
+    if kind == "flat":
+        out += [
+            ("ak", lambda: df.ak(), mbytes),
+            ("draw", lambda: df.draw("x0+x1", "x2>0 and i0<5", bins="50,-5,5"), mbytes),
+            (
+                "iter_draw",
+                lambda: pdroot.iter_draw(
+                    fname, "x0+x1", "x2>0", treename="t", bins="50,-5,5", progress=False
+                ),
+                fsize,
+            ),
+        ]
+    else:
+        jet_pt = df["Jet_pt"].ak()
+        out += [
+            (
+                "array_to_arrow_or_numpy",
+                lambda: array_to_arrow_or_numpy(jet_pt),
+                frame_nbytes(df[["Jet_pt"]]),
+            ),
+            ("ak", lambda: df.ak(), mbytes),
+            (
+                "draw_flat",
+                lambda: df.draw("MET_pt", "MET_pt>40", bins="50,0,500"),
+                mbytes,
+            ),
+            (
+                "draw_jagged",
+                lambda: df.draw("Jet_pt", "abs(Jet_eta)<2.4", bins="50,0,500"),
+                mbytes,
+            ),
+            (
+                "draw_reduction",
+                lambda: df.draw("sum(Jet_pt[abs(Jet_eta)<2.4])", bins="50,0,1000"),
+                mbytes,
+            ),
+            (
+                "draw_index",
+                lambda: df.draw(
+                    "Jet_pt[0]:Jet_eta[0]", "MET_pt>40", bins="50,0,500,50,-3,3"
+                ),
+                mbytes,
+            ),
+            (
+                "iter_draw",
+                lambda: pdroot.iter_draw(
+                    fname,
+                    "sum(Jet_pt[abs(Jet_eta)<2.4])",
+                    "MET_pt>40",
+                    treename="t",
+                    bins="50,0,1000",
+                    progress=False,
+                ),
+                fsize,
+            ),
+        ]
+    return out
+
+
+def run_one(func, repeat):
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        with PeakMemory() as mem:
+            t0 = time.perf_counter()
+            func()
+            t1 = time.perf_counter()
+        times.append(t1 - t0)
+        peak = max(peak, mem.peak)
+    return min(times), peak
+
+
+def run(sizes, kinds, repeat, workdir):
+    results = []
+    for kind in kinds:
+        for nevents in sizes:
+            df = make_flat(nevents) if kind == "flat" else make_nano(nevents)
+            for name, func, nbytes in benchmarks(workdir, kind, df):
+                t, peak = run_one(func, repeat)
+                result = dict(
+                    name=f"{kind}/{name}",
+                    nevents=nevents,
+                    seconds=t,
+                    events_per_second=nevents / t,
+                    mb_per_second=1e-6 * nbytes / t,
+                    peak_mb=1e-6 * peak,
+                )
+                results.append(result)
+                print(format_result(result), flush=True)
+    return results
+
+
+def result_key(result):
+    return f"{result['name']}@{result['nevents']}"
+
+
+def format_result(result, baseline=None):
+    line = (
+        "{:<36s} {:>9d} {:>9.4f}s {:>12.3g} ev/s {:>9.1f} MB/s {:>9.1f} MB peak".format(
+            result["name"],
+            result["nevents"],
+            result["seconds"],
+            result["events_per_second"],
+            result["mb_per_second"],
+            result["peak_mb"],
+        )
+    )
+    if baseline is not None:
+        ratio = result["seconds"] / baseline["seconds"]
+        line += f"   x{ratio:.2f} time vs baseline"
+    return line
+
+
+def compare(results, baseline, tolerance):
+    baseline = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+    print("\nComparison with baseline:")
+    for result in results:
+        base = baseline.get(result_key(result))
+        print(format_result(result, base))
+        if base is None:
+            continue
+        if result["seconds"] > (1 + tolerance) * base["seconds"]:
+            regressions.append(result_key(result))
+    if regressions:
+        print(f"\nRegressions (slower by more than {100*tolerance:.0f}%):")
+        for key in regressions:
+            print(f"    {key}")
+    return regressions
+
+
+def versions():
+    out = dict(python=platform.python_version())
+    for name in [
+        "numpy",
+        "pandas",
+        "pyarrow",
+        "awkward1",
+        "awkward",
+        "uproot4",
+        "uproot",
+        "uproot3",
+        "yahist",
+    ]:
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        out[name] = getattr(module, "__version__", "unknown")
+    return out
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000,1000000",
+        help="comma-separated number of events",
+    )
+    parser.add_argument(
+        "--kinds", default="flat,nano", help="comma-separated subset of flat,nano"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="repetitions per benchmark (fastest is kept)",
+    )
+    parser.add_argument("--save", default=None, help="write results to this JSON file")
+    parser.add_argument(
+        "--compare", default=None, help="compare against results in this JSON file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed fractional slowdown vs baseline",
+    )
+    args = parser.parse_args(args)
+
+    sizes = [int(float(x)) for x in args.sizes.split(",")]
+    kinds = args.kinds.split(",")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(sizes, kinds, args.repeat, workdir)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(dict(versions=versions(), results=results), fh, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
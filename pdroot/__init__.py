@@ -1,15 +1,107 @@
+import importlib
+
 import pandas
 from pandas.core.base import PandasObject
 
+# The backends (awkward, uproot, yahist, ...) take a while to import, so the pandas
+# methods and accessors registered here are thin stubs which import them on first use,
+# and the rest of the API is loaded on attribute access (e.g., `pdroot.iter_draw`).
+
+_lazy_attributes = dict(
+    tree_draw="draw",
+    tree_adraw="draw",
+    iter_draw="draw",
+    iter_draw_progressive="draw",
+    define="draw",
+    tree_cutflow="cutflow",
+    iter_cutflow="cutflow",
+    read_root="readwrite",
+    to_root="readwrite",
+    read_arrow="readwrite",
+    to_arrow="readwrite",
+    iter_chunks="readwrite",
+    ChunkDataFrame="readwrite",
+    to_pandas="readwrite",
+    AwkwardArrayAccessor="accessors",
+    AwkwardArraysAccessor="accessors",
+    LorentzVectorAccessor="accessors",
+)
+
+_submodules = [
+    "accessors",
+    "aio",
+    "cache",
+    "categorical",
+    "cutflow",
+    "draw",
+    "executors",
+    "histograms",
+    "jagged",
+    "lorentz",
+    "parse",
+    "readwrite",
+    "server",
+    "stats",
+]
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        module = importlib.import_module(f".{_lazy_attributes[name]}", __name__)
+        return getattr(module, name)
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_submodules))
+
+
+def _lazy_function(module, name):
+    def wrapper(*args, **kwargs):
+        return getattr(importlib.import_module(f".{module}", __name__), name)(
+            *args, **kwargs
+        )
+
+    wrapper.__name__ = name
+    wrapper.__qualname__ = name
+    wrapper.__doc__ = f"See `pdroot.{module}.{name}` (imported on first call)."
+    return wrapper
+
+
+PandasObject.draw = _lazy_function("draw", "tree_draw")
+PandasObject.adraw = _lazy_function("draw", "tree_adraw")
+PandasObject.define = _lazy_function("draw", "define")
+PandasObject.cutflow = _lazy_function("cutflow", "tree_cutflow")
+PandasObject.to_root = _lazy_function("readwrite", "to_root")
+PandasObject.to_arrow = _lazy_function("readwrite", "to_arrow")
+setattr(pandas, "read_root", _lazy_function("readwrite", "read_root"))
+setattr(pandas, "read_arrow", _lazy_function("readwrite", "read_arrow"))
+
+
+class _LazyAccessor:
+    name = None
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __call__(self, *args, **kwargs):
+        from . import accessors
+
+        return getattr(accessors, self.name)(self._obj)(*args, **kwargs)
+
 
-from .draw import tree_draw, tree_adraw, iter_draw
+@pandas.api.extensions.register_series_accessor("ak")
+class _SeriesAwkwardAccessor(_LazyAccessor):
+    name = "AwkwardArrayAccessor"
 
-PandasObject.draw = tree_draw
-PandasObject.adraw = tree_adraw
 
-from .readwrite import read_root, to_root, iter_chunks, ChunkDataFrame, to_pandas
+@pandas.api.extensions.register_dataframe_accessor("ak")
+class _DataFrameAwkwardAccessor(_LazyAccessor):
+    name = "AwkwardArraysAccessor"
 
-setattr(pandas, "read_root", read_root)
-PandasObject.to_root = to_root
 
-from .accessors import AwkwardArrayAccessor, LorentzVectorAccessor
+@pandas.api.extensions.register_dataframe_accessor("p4")
+class _LorentzVectorAccessor(_LazyAccessor):
+    name = "LorentzVectorAccessor"
@@ -1,26 +1,42 @@
-import awkward0
-import awkward1
+import weakref
 import pyarrow
+import awkward1
 import pandas as pd
-import uproot3_methods
 import numpy as np
 
-from .readwrite import ChunkDataFrame
+from .readwrite import ChunkDataFrame, arrow_array_from_values, legacy_modules
+from . import lorentz
 
 
-def pandas_series_to_awkward(series, version=1):
-    values = series.values
-    if "fletcher" not in str(values.dtype).lower():
-        if version == 1:
-            return awkward1.from_numpy(values)
-        else:
-            return np.array(values, copy=False)
+# Conversions of Arrow-backed columns, keyed by (id of the pandas ExtensionArray, version).
+# Entries hold a weak reference to the ExtensionArray (and drop out of the cache when it's
+# garbage collected), as well as the underlying `pyarrow.ChunkedArray`. If a column is
+# mutated, pandas swaps out the ChunkedArray, so comparing it on lookup invalidates the entry.
+_awkward_views = dict()
+
+
+def _cached_view(values, version):
+    key = (id(values), version)
+    data = values.__arrow_array__()
+    entry = _awkward_views.get(key)
+    if entry is not None:
+        ref, cached_data, array = entry
+        if (ref() is values) and (cached_data is data):
+            return array
+    array = _arrow_to_awkward(arrow_array_from_values(values), version)
+    ref = weakref.ref(values, lambda _: _awkward_views.pop(key, None))
+    _awkward_views[key] = (ref, data, array)
+    return array
 
-    array_arrow = values.data
 
+def _arrow_to_awkward(array_arrow, version):
     if version == 0:
+        _, awkward0 = legacy_modules()
+        if array_arrow.offset != 0:
+            # awkward0 ignores the offset of sliced arrays (e.g., from `df.iloc[i:j]`)
+            array_arrow = pyarrow.concat_arrays([array_arrow])
         array = awkward0.fromarrow(array_arrow)
-        if "MaskedArray" in str(type(array)):
+        if isinstance(array, awkward0.MaskedArray):
             array = array._content[array.boolmask()]
     elif version == 1:
         array = awkward1.from_arrow(array_arrow)
@@ -31,7 +47,18 @@ def pandas_series_to_awkward(series, version=1):
     return array
 
 
-@pd.api.extensions.register_series_accessor("ak")
+def pandas_series_to_awkward(series, version=1):
+    values = series.values
+    if isinstance(values.dtype, pd.ArrowDtype):
+        return _cached_view(values, version)
+    if version != 1:
+        return np.array(values, copy=False)
+    if isinstance(values, np.ndarray) and not values.dtype.hasobject:
+        return awkward1.from_numpy(values)
+    # e.g., categorical or object (string) columns
+    return awkward1.from_arrow(pyarrow.array(values))
+
+
 class AwkwardArrayAccessor:
     def __init__(self, obj):
         self._obj = obj
@@ -41,7 +68,6 @@ class AwkwardArrayAccessor:
         return pandas_series_to_awkward(self._obj, version=version)
 
 
-@pd.api.extensions.register_dataframe_accessor("ak")
 class AwkwardArraysAccessor:
     def __init__(self, pandas_obj):
         self._obj = pandas_obj
@@ -49,27 +75,30 @@ class AwkwardArraysAccessor:
     def __call__(self, version=1):
         df = self._obj
         if version == 0:
+            _, awkward0 = legacy_modules()
             return awkward0.Table(
                 dict((c, df[c].ak(version=version)) for c in df.columns)
             )
         elif version == 1:
-            return awkward1.from_arrow(pyarrow.Table.from_pandas(df))
+            # zero-copy: a record array pointing at each column's (cached) layout
+            contents = [df[c].ak(version=version).layout for c in df.columns]
+            keys = [str(c) for c in df.columns]
+            return awkward1.Array(awkward1.layout.RecordArray(contents, keys, len(df)))
         else:
             raise RuntimeError(
                 "What version of awkward do you want? Specify `version=0` or `1`."
             )
 
 
-@pd.api.extensions.register_dataframe_accessor("p4")
 class LorentzVectorAccessor:
     def __init__(self, pandas_obj):
         self._obj = pandas_obj
 
     def __call__(self, which):
-        components = [f"{which}_{x}" for x in ["pt", "eta", "phi", "mass"]]
+        components = lorentz.p4_columns(f"{which}_p4")
         if not isinstance(self._obj, ChunkDataFrame):
             missing_columns = set(components) - set(self._obj.columns)
             if len(missing_columns):
                 raise AttributeError("Missing columns: {}".format(missing_columns))
-        arrays = (self._obj[c].ak(version=0) for c in components)
-        return uproot3_methods.TLorentzVectorArray.from_ptetaphim(*arrays)
+        arrays = (self._obj[c].ak() for c in components)
+        return lorentz.from_ptetaphim(*arrays)
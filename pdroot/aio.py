@@ -0,0 +1,176 @@
+import os
+import asyncio
+import threading
+import functools
+import collections
+import weakref
+
+from .executors import make_work_units, read_work_unit
+from .draw import draw_work_unit, _draw_columns_and_opts, _take_binning, _sum_hists
+
+# Asyncio versions of `iter_chunks` and `iter_draw`, for services which multiplex many scans on one
+# event loop. Reading, decompressing, and histogramming a work unit (a file and an entry range) run in
+# a thread pool (uproot, awkward, and numpy release the GIL), and scans sharing a `limit` share its
+# number of units in flight. Cancelling a scan cancels its units that haven't started yet.
+
+_default_limits = weakref.WeakKeyDictionary()
+
+
+def default_limit():
+    """
+    Semaphore shared by the scans on the running event loop that don't specify a `limit`,
+    allowing as many work units in flight as there are CPUs
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _default_limits:
+        _default_limits[loop] = asyncio.Semaphore(os.cpu_count() or 4)
+    return _default_limits[loop]
+
+
+def _get_limit(limit):
+    if limit is None:
+        return default_limit()
+    if isinstance(limit, int):
+        return asyncio.Semaphore(limit)
+    return limit
+
+
+async def _in_thread(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def _run_limited(limit, executor, func, *args):
+    """
+    Runs `func(*args)` in a thread once `limit` allows it. The slot is released when the
+    thread is done, rather than when the task is cancelled (the thread keeps running).
+    """
+    await limit.acquire()
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+    state = dict(started=False, cancelled=False)
+
+    def release():
+        try:
+            loop.call_soon_threadsafe(limit.release)
+        except RuntimeError:
+            pass  # the event loop is closed
+
+    def run():
+        with lock:
+            if state["cancelled"]:
+                return None
+            state["started"] = True
+        try:
+            return func(*args)
+        finally:
+            release()
+
+    try:
+        return await loop.run_in_executor(executor, run)
+    except BaseException:
+        # (e.g., cancelled)
+        with lock:
+            state["cancelled"] = True
+            started = state["started"]
+        if not started:
+            limit.release()
+        raise
+
+
+async def aiter_chunks(
+    path,
+    treename="t",
+    step_size="50MB",
+    columns=None,
+    limit=None,
+    prefetch=2,
+    executor=None,
+):
+    """
+    Asynchronous iterator over the files in `path` in chunks of `step_size` (as for `iter_chunks`),
+    returning dataframes in order. Up to `prefetch` chunks are read ahead in a thread pool
+    (`executor`, or the default one of the event loop).
+
+    columns: list of columns ("branches") to read (default of `None` reads all)
+    limit: maximum number of chunks being read at once, as a number or an `asyncio.Semaphore`
+        shared with other scans (default of `None` shares `default_limit()`)
+
+    >>> async for df in aiter_chunks("nano_*.root", treename="Events", columns=["MET_pt"]):
+    ...     print(df["MET_pt"].mean())
+    """
+    limit = _get_limit(limit)
+    units = await _in_thread(
+        executor, make_work_units, path, treename, step_size, columns
+    )
+    pending = collections.deque()
+    try:
+        for unit in units:
+            pending.append(
+                asyncio.ensure_future(
+                    _run_limited(limit, executor, read_work_unit, unit, columns)
+                )
+            )
+            if len(pending) >= max(prefetch, 1):
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def aiter_draw(
+    path,
+    varexp,
+    sel="",
+    treename="t",
+    bins=None,
+    step_size="50MB",
+    defines=None,
+    limit=None,
+    executor=None,
+    **kwargs,
+):
+    """
+    Coroutine version of `iter_draw`, returning the sum of the histograms of the work units of the
+    files in `path`, which are read and drawn concurrently in a thread pool (`executor`, or the default
+    one of the event loop), at most `limit` at a time (as for `aiter_chunks`).
+    Other arguments are as for `iter_draw`.
+
+    >>> h = await aiter_draw("nano_*.root", "MET_pt", bins="50,0,500", treename="Events")
+    >>> # two scans, sharing 8 units in flight
+    >>> limit = asyncio.Semaphore(8)
+    >>> h1, h2 = await asyncio.gather(
+    ...     aiter_draw("a_*.root", "MET_pt", bins="50,0,500", limit=limit),
+    ...     aiter_draw("b_*.root", "MET_pt", bins="50,0,500", limit=limit),
+    ... )
+    """
+    columns, opts = _draw_columns_and_opts(varexp, sel, bins, defines, kwargs)
+    limit = _get_limit(limit)
+    units = await _in_thread(
+        executor, make_work_units, path, treename, step_size, columns
+    )
+    args = (varexp, sel, columns, opts)
+    hists, units = await _run_limited(
+        limit,
+        executor,
+        _take_binning,
+        units,
+        opts,
+        lambda first: [draw_work_unit(unit, *args) for unit in first],
+    )
+    tasks = [
+        asyncio.ensure_future(
+            _run_limited(limit, executor, draw_work_unit, unit, *args)
+        )
+        for unit in units
+    ]
+    try:
+        hists.extend(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+    return _sum_hists(hists, varexp, opts)
@@ -0,0 +1,220 @@
+import os
+import glob
+import pickle
+import hashlib
+import collections
+
+import numpy as np
+import pandas as pd
+import uproot4
+import xxhash
+
+from .readwrite import is_arrow_filename, arrow_row_groups
+
+# Result cache for `df.draw` and `iter_draw`. Keys combine the normalized (post-`to_ak_expr`)
+# expressions and binning with a cheap fingerprint of the input: the identity of the column
+# buffers (address, length, dtype, and a small strided sample of values) for DataFrames,
+# and the file UUID and entry range for ROOT files.
+
+
+class DrawCache:
+    """
+    LRU cache of draw results, kept in memory and optionally persisted
+    as pickle files in the directory `path`.
+
+    >>> cache = DrawCache(maxsize=64, path="drawcache/")
+    >>> df.draw("Jet_pt", "MET_pt>40", bins="50,0,200", cache=cache)
+    """
+
+    def __init__(self, maxsize=128, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return (key in self._entries) or (
+            self.path is not None and os.path.exists(self._filename(key))
+        )
+
+    def _filename(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        if self.path is not None and os.path.exists(self._filename(key)):
+            with open(self._filename(key), "rb") as fh:
+                value = pickle.load(fh)
+            self._insert(key, value)
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._insert(key, value)
+        if self.path is not None:
+            # write then rename, so that concurrent readers never see a partial file
+            tmp = f"{self._filename(key)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                pickle.dump(value, fh)
+            os.replace(tmp, self._filename(key))
+
+    def _insert(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Clears the in-memory entries and any persisted files
+        """
+        self._entries.clear()
+        if self.path is not None:
+            for fname in glob.glob(os.path.join(self.path, "*.pkl")):
+                os.remove(fname)
+
+
+default_cache = DrawCache()
+
+
+def get_cache(cache):
+    """
+    Returns the `DrawCache` for a `cache=` argument (`True` means the module-level default)
+    """
+    if cache is True:
+        return default_cache
+    if isinstance(cache, DrawCache):
+        return cache
+    if not cache:
+        return None
+    raise TypeError(f"cache must be a bool or DrawCache, not {type(cache)}")
+
+
+def make_key(*parts):
+    """
+    Hex digest of the repr of the given (nested) parts
+    """
+    return hashlib.blake2b(repr(parts).encode(), digest_size=20).hexdigest()
+
+
+def value_token(value):
+    """
+    Hashable stand-in for an argument (e.g., `bins` or a value in `env`),
+    digesting numpy arrays rather than relying on their truncated repr
+    """
+    if isinstance(value, np.ndarray):
+        return (value.shape, str(value.dtype), make_key(value.tobytes()))
+    if isinstance(value, dict):
+        return tuple((k, value_token(v)) for k, v in sorted(value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(value_token(v) for v in value)
+    return repr(value)
+
+
+def _digest(buffer):
+    # (xxhash goes through memory about as fast as it can be read)
+    return xxhash.xxh3_64_hexdigest(buffer)
+
+
+def array_fingerprint(values):
+    """
+    Fingerprint of a numpy array or ArrowExtensionArray, from the address and
+    size of its buffers plus a digest of all of their bytes (so that in-place
+    modifications are noticed).
+    """
+    if isinstance(values, np.ndarray):
+        return (
+            values.__array_interface__["data"][0],
+            values.shape,
+            values.strides,
+            str(values.dtype),
+            _digest(np.ascontiguousarray(values).view(np.uint8)),
+        )
+    if isinstance(values.dtype, pd.ArrowDtype):
+        out = [len(values), str(values.dtype)]
+        for chunk in values.__arrow_array__().chunks:
+            out.append(chunk.offset)
+            for b in chunk.buffers():
+                out.extend([b.address, _digest(b)] if b is not None else [0])
+        return tuple(out)
+    # e.g., object dtype: fall back to hashing everything
+    return (len(values), str(values.dtype), make_key(list(map(repr, values))))
+
+
+def file_fingerprint(fname, treename):
+    """
+    UUID of a ROOT file and the number of entries in its tree
+    (or the size, modification time and row groups of a Parquet/Arrow file)
+    """
+    if is_arrow_filename(fname):
+        stat = os.stat(fname)
+        return (stat.st_size, stat.st_mtime_ns, tuple(arrow_row_groups(fname)))
+    with uproot4.open(fname) as f:
+        return (str(f.file.uuid), treename, f[treename].num_entries)
+
+
+def expand_path(path, treename):
+    """
+    List of (filename, treename) pairs for an `iter_draw`-style path,
+    which may contain a glob and/or a ":treename" suffix.
+    """
+    if isinstance(path, (list, tuple)):
+        return [x for p in path for x in expand_path(p, treename)]
+    fname = path
+    if ":" in os.path.basename(path):
+        fname, treename = path.rsplit(":", 1)
+    fnames = sorted(glob.glob(fname)) or [fname]
+    return [(x, treename) for x in fnames]
+
+
+def dataframe_fingerprint(df, columns):
+    """
+    Fingerprint of the given `columns` of `df`. For a `ChunkDataFrame`, columns
+    that haven't been read yet are identified by the file and entry range.
+    """
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        out = [len(df), (index.start, index.stop, index.step)]
+    else:
+        out = [len(df), array_fingerprint(index.values)]
+    unread = []
+    for column in sorted(columns):
+        if column in df.columns:
+            out.append((column, array_fingerprint(df[column].values)))
+        elif getattr(df, "filename", None) is not None:
+            unread.append(column)
+        else:
+            raise KeyError(column)
+    if unread:
+        out.append(
+            (
+                tuple(unread),
+                file_fingerprint(df.filename, df.treename),
+                df.entry_start,
+                df.entry_stop,
+            )
+        )
+    return tuple(out)
+
+
+def copy_result(result):
+    """
+    Copy of a draw result (histogram(s), array or tuple/dictionary of arrays),
+    so that callers can't modify what's in the cache
+    """
+    if isinstance(result, tuple):
+        return tuple(copy_result(x) for x in result)
+    if type(result) is dict:
+        return {k: copy_result(v) for k, v in result.items()}
+    return result.copy()
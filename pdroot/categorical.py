@@ -0,0 +1,94 @@
+import weakref
+
+import numpy as np
+import pandas as pd
+import xxhash
+
+# String columns are evaluated as `pandas.Categorical`s (integer codes plus the unique strings),
+# and `pdroot.parse` rewrites comparisons with string constants (`sr == "foo"`, `sr in ["a", "b"]`)
+# into calls of `equal`/`isin`, which compare the codes with the codes of the constants,
+# so selecting on string labels costs as much as an integer comparison.
+#
+# Object columns are factorized on first use and cached, keyed by the id of the numpy array.
+# An entry holds a weak reference to the array and a digest of its object pointers, so that an
+# in-place modification of the column (which stores a different object) is detected by hashing
+# the pointers in place (no copies), at about the cost of comparing the codes.
+_categoricals = dict()
+
+
+def _pointers_digest(values):
+    # (the buffer of an object array holds the pointers)
+    return xxhash.xxh3_64_intdigest(np.ascontiguousarray(values))
+
+
+def is_label_column(series):
+    """
+    Whether a column holds strings (categorical, or object dtype with strings)
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) or (
+        id(series.values) in _categoricals
+    ):
+        return True
+    return (series.dtype == np.dtype("O")) and (
+        pd.api.types.infer_dtype(series, skipna=True) == "string"
+    )
+
+
+def as_categorical(series):
+    """
+    The column as a `pandas.Categorical`, factorizing the strings if needed
+    (once, as long as the column isn't modified)
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.values
+    values = series.values
+    key = id(values)
+    entry = _categoricals.get(key)
+    if entry is not None:
+        ref, digest, cat = entry
+        if (ref() is values) and (digest == _pointers_digest(values)):
+            return cat
+    cat = pd.Categorical(values)
+    ref = weakref.ref(values, lambda _: _categoricals.pop(key, None))
+    _categoricals[key] = (ref, _pointers_digest(values), cat)
+    return cat
+
+
+def _codes_of(values, labels):
+    codes = values.categories.get_indexer(list(labels))
+    return codes[codes >= 0]
+
+
+def equal(values, label):
+    """
+    `values == label`, comparing category codes for a `pandas.Categorical`
+    (`label` may also be a categorical, with different categories)
+
+    >>> equal(pd.Categorical(["foo", "bar", "foo"]), "foo")
+    array([ True, False,  True])
+    """
+    if isinstance(label, pd.Categorical) and not isinstance(values, pd.Categorical):
+        values, label = label, values
+    if isinstance(values, pd.Categorical) and isinstance(label, pd.Categorical):
+        # codes of `label` in the categories of `values` (-1 for missing values or categories)
+        mapping = np.append(values.categories.get_indexer(label.categories), -1)
+        codes = mapping[label.codes]
+        return (values.codes == codes) & (codes >= 0)
+    if isinstance(values, pd.Categorical) and not np.isscalar(label):
+        return np.asarray(values, dtype=object) == np.asarray(label, dtype=object)
+    if isinstance(values, pd.Categorical):
+        codes = _codes_of(values, [label])
+        if len(codes) == 0:
+            return np.zeros(len(values), dtype=bool)
+        return values.codes == codes[0]
+    return values == label
+
+
+def isin(values, labels):
+    """
+    Whether each of the `values` is in `labels` (as per `np.isin`),
+    comparing category codes for a `pandas.Categorical`
+    """
+    if isinstance(values, pd.Categorical):
+        return np.isin(values.codes, _codes_of(values, labels))
+    return np.isin(values, labels)
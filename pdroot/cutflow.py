@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from .draw import evaluate, columns_to_read, _event_mask
+from .parse import variables_in_expr
+from .executors import make_work_units, read_work_unit, run_work_units
+
+# Cutflows from a single evaluation of each cut. The per-row masks are packed into bitsets
+# (one bit per row), so that the cumulative selections and the "N-1" selections (all cuts but
+# one, from ANDs of prefixes and suffixes of the list of cuts) are cheap bytewise ANDs,
+# and unweighted counts are popcounts. Results are DataFrames, which add up across chunks.
+
+_BITCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def _row_mask(df, expr, env, defines):
+    mask = _event_mask(evaluate(df, expr, env, defines))
+    if mask is None:
+        raise ValueError(f"Cut `{expr}` doesn't give one boolean per row.")
+    return mask
+
+
+def _yields(bits, vweights, nrows):
+    count = int(_BITCOUNT[bits].sum())
+    if vweights is None:
+        return count, float(count), float(count)
+    w = vweights[np.unpackbits(bits, count=nrows).view(bool)]
+    return count, w.sum(), (w * w).sum()
+
+
+def tree_cutflow(df, cuts, weights="", env=dict(), defines=None):
+    """
+    Cutflow of a list of (per-row) `cuts`, evaluating each cut once, as a DataFrame
+    with a row for all rows ("all") and for each cut, and columns
+        count, sumw, sumw2: number of rows and sum of weights (and squared weights)
+            passing this cut and all the previous ones
+        count_nminus1, sumw_nminus1, sumw2_nminus1: passing all the cuts except this one
+            (all of the cuts, for the first row)
+    Cutflows of separate chunks can be added.
+
+    >>> df.cutflow(["MET_pt > 50", "length(Jet_pt) >= 2", "Jet_pt[0] > 100"], weights="genWeight")
+    """
+    nrows = len(df)
+    vweights = None
+    if weights:
+        vweights = np.asarray(evaluate(df, weights, env, defines), dtype=np.float64)
+        if vweights.ndim != 1:
+            raise ValueError(f"Weights `{weights}` don't give one value per row.")
+
+    everything = np.packbits(np.ones(nrows, dtype=bool))
+    bits = [np.packbits(_row_mask(df, cut, env, defines)) for cut in cuts]
+
+    # prefixes[i] (suffixes[i]) passes cuts[:i] (cuts[i:])
+    prefixes = [everything]
+    for b in bits:
+        prefixes.append(prefixes[-1] & b)
+    suffixes = [everything]
+    for b in bits[::-1]:
+        suffixes.append(suffixes[-1] & b)
+    suffixes = suffixes[::-1]
+
+    rows = [
+        _yields(prefixes[0], vweights, nrows) + _yields(prefixes[-1], vweights, nrows)
+    ]
+    for i in range(len(cuts)):
+        rows.append(
+            _yields(prefixes[i + 1], vweights, nrows)
+            + _yields(prefixes[i] & suffixes[i + 1], vweights, nrows)
+        )
+    return _cutflow_frame(rows, cuts)
+
+
+def _cutflow_frame(rows, cuts):
+    columns = ["count", "sumw", "sumw2"]
+    columns += [f"{c}_nminus1" for c in columns]
+    index = pd.Index(["all"] + list(cuts), name="cut")
+    return pd.DataFrame(rows, index=index, columns=columns)
+
+
+def cutflow_work_unit(unit, cuts, weights, columns, opts):
+    """
+    Cutflow of the entries in a `pdroot.executors.WorkUnit`
+    """
+    df = read_work_unit(unit, columns)
+    return tree_cutflow(df, cuts, weights, **opts)
+
+
+def iter_cutflow(
+    path,
+    cuts,
+    weights="",
+    treename="t",
+    progress=True,
+    step_size="50MB",
+    defines=None,
+    executor=None,
+    checkpoint=None,
+    retries=0,
+    on_error="raise",
+):
+    """
+    Cutflow (see `tree_cutflow`) of the files in `path`, processed in chunks of `step_size`
+    and added up, reading only the needed branches. `defines`, `executor`, `checkpoint`,
+    `retries`, and `on_error` are as for `iter_draw`.
+
+    >>> iter_cutflow("nano_*.root", ["MET_pt > 50", "nJet >= 2"], treename="Events", executor="processes")
+    """
+    exprs = "$".join(list(cuts) + [weights])
+    columns = columns_to_read(variables_in_expr(exprs, aliases=defines or dict()))
+    units = make_work_units(path, treename, step_size, columns, on_error="skip")
+    opts = dict(defines=defines) if defines else dict()
+    iterable = run_work_units(
+        cutflow_work_unit,
+        units,
+        list(cuts),
+        weights,
+        columns,
+        opts,
+        executor=executor,
+        checkpoint=checkpoint,
+        retries=retries,
+        on_error=on_error,
+    )
+    if progress:
+        iterable = tqdm(iterable, total=len(units))
+    cutflows = list(iterable)
+    if not cutflows:
+        # e.g., no entries
+        return _cutflow_frame([(0, 0.0, 0.0) * 2] * (len(cuts) + 1), cuts)
+    return sum(cutflows)
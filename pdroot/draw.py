@@ -1,13 +1,12 @@
 import time
+import inspect
+import concurrent.futures
 import numpy as np
 import pandas as pd
 
 import warnings
 
 warnings.simplefilter("ignore", category=FutureWarning)
-import uproot3
-import uproot4
-
 import awkward1
 
 from tqdm.auto import tqdm
@@ -16,8 +15,28 @@ warnings.resetwarnings()
 
 from yahist import Hist1D, Hist2D
 
-from .readwrite import awkward1_arrays_to_dataframe, iter_chunks
+from .readwrite import (
+    awkward1_arrays_to_dataframe,
+    array_to_arrow_or_numpy,
+    iter_chunks,
+    is_arrow_path,
+    ChunkDataFrame,
+)
 from .parse import variables_in_expr, to_ak_expr, split_expr_on_free_colon
+from .cache import (
+    DrawCache,
+    get_cache,
+    make_key,
+    value_token,
+    dataframe_fingerprint,
+    file_fingerprint,
+    expand_path,
+    copy_result,
+)
+from .executors import make_work_units, read_work_unit, run_work_units, get_executor
+from .stats import prune_work_units
+from .histograms import fill_histograms, Profile1D
+from . import lorentz, jagged, categorical
 
 
 def _array_ndim(array):
@@ -35,32 +54,201 @@ def _has_mask(vals):
     return False
 
 
-def _tree_draw_to_array(df, varexp, sel="", weights="", env=dict()):
+def _memoize(func):
+    """
+    Caches results of `func` keyed on the identity of its arguments, so that
+    repeated subexpressions like `combinations(Jet_p4, 2)` are only computed once
+    within an expression. Arguments are kept alive by the cache so ids aren't reused.
+    """
+    cache = dict()
+
+    def wrapper(*args):
+        key = tuple(map(id, args))
+        if key not in cache:
+            cache[key] = (args, func(*args))
+        return cache[key][1]
+
+    return wrapper
+
+
+def columns_to_read(colnames):
+    """
+    Expands names of Lorentz vectors (e.g., "Jet_p4") into
+    the columns/branches needed to build them.
+    """
+    columns = []
+    for colname in colnames:
+        columns.extend(lorentz.p4_columns(colname) or [colname])
+    return sorted(set(columns))
+
+
+def get_defines(df, defines=None):
+    """
+    Returns the lazily-defined columns of `df` (see `define`),
+    updated with the optional dictionary `defines`.
+    """
+    out = dict(df.attrs.get("defines", dict()))
+    out.update(defines or dict())
+    return out
+
+
+def define(df, name, expr):
+    """
+    Returns a shallow copy of `df` with a lazily-evaluated column `name`.
+    Only the expression is stored. It's substituted into `draw` expressions
+    that refer to `name` (and evaluated after event-level selections), or
+    evaluated in chunks when writing with `to_root`.
+
+    >>> df = df.define("ht", "sum(Jet_pt[Jet_pt>40])")
+    >>> df.draw("ht", "ht > 500 and MET_pt > 50")
+    """
+    if name in df.columns:
+        raise ValueError(f"Column `{name}` already exists.")
+    out = df.copy(deep=False)
+    out.attrs["defines"] = get_defines(df, {name: expr})
+    return out
 
-    varexp_exprs = [to_ak_expr(expr) for expr in split_expr_on_free_colon(varexp)]
-    weights_expr = to_ak_expr(weights)
-    sel_expr = to_ak_expr(sel)
 
-    colnames = variables_in_expr(f"{varexp}${sel}${weights}")
-    loc = {"ak": awkward1, "np": np, "pd": pd}
+def _namespace(df, colnames, env=dict()):
+    loc = {
+        "ak": awkward1,
+        "np": np,
+        "pd": pd,
+        "jagged": jagged,
+        "categorical": categorical,
+    }
+    loc.update(lorentz.functions)
+    loc.update({k: _memoize(v) for k, v in jagged.functions.items()})
     for colname in colnames:
+        if (colname not in df.columns) and lorentz.p4_columns(colname):
+            loc[colname] = df.p4(colname[: -len("_p4")])
+            continue
+        if categorical.is_label_column(df[colname]):
+            loc[colname] = categorical.as_categorical(df[colname])
+            continue
         version = 1
         if df[colname].dtype == np.dtype("O"):
             version = 0
         loc[colname] = df[colname].ak(version)
     loc.update(env)
+    return loc
+
+
+def _event_mask(mask):
+    """
+    Returns `mask` as a numpy boolean array if it's a plain per-row mask
+    (not jagged), otherwise `None`. Missing values (e.g., from `Jet_pt[0] > 40`
+    for rows without jets) don't pass the selection.
+    """
+    if isinstance(mask, awkward1.Array):
+        if isinstance(mask.layout, awkward1.layout.IndexedOptionArray64):
+            if mask.ndim != 1:
+                return None
+            mask = awkward1.fill_none(mask, False)
+        if not isinstance(mask.layout, awkward1.layout.NumpyArray):
+            return None
+        mask = np.asarray(mask)
+    if isinstance(mask, np.ndarray) and (mask.ndim == 1) and (mask.dtype == bool):
+        return mask
+    return None
+
+
+def evaluate(df, expr, env=dict(), defines=None):
+    """
+    Evaluates an expression with one result per row (jagged results stay jagged),
+    e.g., to materialize a lazily-defined column.
+    """
+    defines = get_defines(df, defines)
+    colnames = variables_in_expr(expr, aliases=defines)
+    loc = _namespace(df, colnames, env)
+    vals = eval(to_ak_expr(expr, aliases=defines), dict(), loc)
+    if _array_ndim(vals) == 0:
+        # booleans (e.g., a constant cut) stay booleans
+        dtype = bool if isinstance(vals, (bool, np.bool_)) else np.float64
+        vals = np.full(len(df), vals, dtype=dtype)
+    return vals
+
+
+def materialize_defines(df):
+    """
+    Returns a shallow copy of `df` where lazily-defined columns (see `define`)
+    are evaluated and added as regular columns.
+    """
+    defines = get_defines(df)
+    if not defines:
+        return df
+    out = df.copy(deep=False)
+    for name, expr in defines.items():
+        vals = evaluate(df, expr)
+        if not isinstance(vals, awkward1.Array):
+            vals = awkward1.from_numpy(np.asarray(vals))
+        out[name] = array_to_arrow_or_numpy(vals)
+    out.attrs.pop("defines")
+    return out
+
+
+def _draw_variables(varexp, sel, weights, defines):
+    """
+    Variables needed by the draw expressions (`weights` can be a dictionary of expressions)
+    """
+    if isinstance(weights, dict):
+        weights = "$".join(weights.values())
+    return variables_in_expr(f"{varexp}${sel}${weights}", aliases=defines)
+
+
+def _categories(values):
+    """
+    Categories of a categorical column, or the sorted unique values of another column
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    return sorted(values.dropna().unique().tolist())
+
+
+def _tree_draw_to_array(
+    df, varexp, sel="", weights="", env=dict(), defines=None, by=None
+):
+
+    defines = get_defines(df, defines)
+    varexp_exprs = [
+        to_ak_expr(expr, aliases=defines) for expr in split_expr_on_free_colon(varexp)
+    ]
+    sel_expr = to_ak_expr(sel, aliases=defines)
+
+    colnames = _draw_variables(varexp, sel, weights, defines)
+    loc = _namespace(df, colnames, env)
+    nrows = len(df)
+
+    if by is not None:
+        # index of the category of each row
+        column, categories = by
+        codes = pd.Categorical(df[column], categories=categories).codes
+        loc["_by_codes"] = codes.astype(np.int64)
+        colnames = colnames + ["_by_codes"]
 
     if sel:
         globalmask = eval(sel_expr, dict(), loc)
+        eventmask = _event_mask(globalmask)
+        if eventmask is not None:
+            # per-row selection: evaluate everything else only on the selected rows
+            for colname in colnames:
+                loc[colname] = loc[colname][eventmask]
+            nrows = int(eventmask.sum())
+            sel = ""
 
     vweights = None
+    vcodes = None
 
-    def expr_to_vals(expr):
-        vals = eval(expr, dict(), loc)
+    def expr_to_vals(expr, like=None):
+        vals = eval(expr, dict(), loc) if isinstance(expr, str) else expr
 
         # if varexp is a simple constant, broadcast it to an array
         if _array_ndim(vals) == 0:
-            vals = vals * np.ones(len(df))
+            vals = vals * np.ones(nrows)
+
+        # e.g., one value per row for each jet
+        if (like is not None) and (_array_ndim(vals) < _array_ndim(like)):
+            vals, _ = awkward1.broadcast_arrays(vals, like)
 
         if sel:
             if _array_ndim(vals) < _array_ndim(globalmask):
@@ -75,11 +263,22 @@ def _tree_draw_to_array(df, varexp, sel="", weights="", env=dict()):
 
     dims = []
     for expr in varexp_exprs:
-        vals = expr_to_vals(expr)
+        evaluated = eval(expr, dict(), loc)
+        if not dims:
+            first_evaluated = evaluated
+        vals = expr_to_vals(evaluated)
         dims.append(vals)
 
-    if weights:
-        vweights = expr_to_vals(weights_expr)
+    if isinstance(weights, dict):
+        vweights = {
+            name: expr_to_vals(to_ak_expr(expr, aliases=defines), first_evaluated)
+            for name, expr in weights.items()
+        }
+    elif weights:
+        vweights = expr_to_vals(to_ak_expr(weights, aliases=defines), first_evaluated)
+
+    if by is not None:
+        vcodes = expr_to_vals(loc["_by_codes"], like=first_evaluated)
 
     mask = None
 
@@ -99,9 +298,10 @@ def _tree_draw_to_array(df, varexp, sel="", weights="", env=dict()):
         if (_has_mask(x) and np.ndim(x.mask) != 0) or (
             _has_mask(y) and np.ndim(y.mask) != 0
         ):
-            mask = x.mask | y.mask
-            x = x.data[~mask]
-            y = y.data[~mask]
+            # only one of them might be masked
+            mask = np.ma.getmaskarray(x) | np.ma.getmaskarray(y)
+            x = np.ma.getdata(x)[~mask]
+            y = np.ma.getdata(y)[~mask]
         elif _has_mask(x):
             x = x.data
         elif _has_mask(y):
@@ -109,22 +309,241 @@ def _tree_draw_to_array(df, varexp, sel="", weights="", env=dict()):
         # vals = np.c_[x, y]
         vals = (x, y)
 
-    if weights:
+    if isinstance(vweights, dict) and (mask is not None):
+        vweights = {name: w[~mask] for name, w in vweights.items()}
+    elif weights and (mask is not None):
+        vweights = vweights[~mask]
+
+    if by is not None:
+        vcodes = np.ma.filled(vcodes, -1)
         if mask is not None:
-            vweights = vweights[~mask]
+            vcodes = vcodes[~mask]
+
+    return vals, vweights, vcodes
+
+
+def _row_slices(nrows, nslices):
+    """
+    Splits `range(nrows)` into `nslices` contiguous slices of (almost) equal size
+    """
+    nslices = max(min(nslices, nrows), 1)
+    bounds = np.linspace(0, nrows, nslices + 1).astype(int)
+    return [slice(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _row_blocks(nrows, chunk_rows):
+    """
+    Splits `range(nrows)` into contiguous slices of at most `chunk_rows` rows
+    """
+    chunk_rows = max(int(chunk_rows), 1)
+    return [slice(lo, lo + chunk_rows) for lo in range(0, max(nrows, 1), chunk_rows)]
+
 
-    return vals, vweights
+def _stratified_order(n):
+    """
+    Order of `range(n)` in which every prefix is spread evenly over the range
+    (by bit-reversed index), e.g., to sample blocks of rows or entry ranges of all files
+
+    >>> _stratified_order(8)
+    [0, 4, 2, 6, 1, 5, 3, 7]
+    """
+    nbits = max((n - 1).bit_length(), 1)
+    return sorted(range(n), key=lambda i: int(format(i, f"0{nbits}b")[::-1], 2))
+
+
+def _sampled_blocks(nrows, approx):
+    """
+    Contiguous slices of about a fraction `approx` of `range(nrows)`, in at least 10 blocks
+    spread evenly over the range (when there are enough rows), and the fraction of rows they hold
+    """
+    if not (0 < approx <= 1):
+        raise ValueError(f"approx must be a fraction in (0, 1], not {approx}")
+    nblocks = max(100, int(np.ceil(10 / approx)))
+    blocks = _row_blocks(nrows, np.ceil(nrows / nblocks))
+    nsampled = max(int(np.ceil(approx * len(blocks))), 1)
+    blocks = sorted(
+        [blocks[i] for i in _stratified_order(len(blocks))[:nsampled]],
+        key=lambda block: block.start,
+    )
+    nused = sum(len(range(nrows)[block]) for block in blocks)
+    return blocks, nused / max(nrows, 1)
+
+
+def _scaled(result, fraction):
+    """
+    Histogram(s) from a `fraction` of the entries scaled up to all of them,
+    with the fraction in `metadata["approx"]`
+    """
+    out = result * (1.0 / fraction) if fraction > 0 else result.copy()
+    out.metadata["approx"] = fraction
+    return out
 
 
-def tree_draw(df, varexp, sel="", weights="", to_array=False, env=dict(), **kwargs):
+def _fixed_bins(bins):
+    """
+    Whether `bins` fully specifies the binning without needing to look at the data
+    (so that histograms of separate chunks can be added)
+    """
+    if isinstance(bins, str):
+        return bins.count(",") in [2, 5]
+    return isinstance(bins, (list, tuple, np.ndarray))
+
+
+def _concatenate_results(results):
+    """
+    Concatenates a list of `(array, weights, codes)` results from `_tree_draw_to_array`
+    """
+    arrays, vweights, vcodes = zip(*results)
+    if isinstance(arrays[0], tuple):
+        array = tuple(np.concatenate(dim) for dim in zip(*arrays))
+    else:
+        array = np.concatenate(arrays)
+    if isinstance(vweights[0], dict):
+        vweights = {
+            name: np.concatenate([w[name] for w in vweights]) for name in vweights[0]
+        }
+    elif vweights[0] is not None:
+        vweights = np.concatenate(vweights)
+    else:
+        vweights = None
+    if vcodes[0] is not None:
+        vcodes = np.concatenate(vcodes)
+    else:
+        vcodes = None
+    return array, vweights, vcodes
+
+
+def _read_draw_columns(df, args):
+    """
+    Reads the branches of a `ChunkDataFrame` needed by `_tree_draw_to_array(df, *args)`
+    """
+    varexp, sel, weights, _, defines, by = args
+    defines = get_defines(df, defines)
+    colnames = _draw_variables(varexp, sel, weights, defines)
+    if by is not None:
+        colnames = colnames + [by[0]]
+    df._possibly_cache(columns_to_read(colnames))
+
+
+def _evaluate_slices(df, args, slices, nthreads, func=None):
+    """
+    Yields `_tree_draw_to_array(df.iloc[rows], *args)` for each of the row `slices`
+    (transformed by `func`, if specified), using a thread pool if `nthreads > 1`
+    (awkward/numpy kernels release the GIL).
+    """
+
+    def work(rows):
+        result = _tree_draw_to_array(df.iloc[rows], *args)
+        if func is not None:
+            result = func(result)
+        return result
+
+    if nthreads > 1:
+        with concurrent.futures.ThreadPoolExecutor(nthreads) as executor:
+            yield from executor.map(work, slices)
+    else:
+        for rows in slices:
+            yield work(rows)
+
+
+def _make_hist(array, vweights, vcodes, kwargs, categories=None):
+    if isinstance(array, tuple) and len(array) == 2:
+        ndim = 2
+    else:
+        ndim = np.ndim(array)
+
+    aggregate = kwargs.get("aggregate")
+    if aggregate is not None:
+        if (ndim != 2) or isinstance(vweights, dict) or (vcodes is not None):
+            raise ValueError(
+                "Profiles need two expressions (x:y), without `by` or several weights."
+            )
+        kwargs = {k: v for k, v in kwargs.items() if k != "aggregate"}
+        return Profile1D.fill(*array, weights=vweights, aggregate=aggregate, **kwargs)
+    if isinstance(vweights, dict) or (vcodes is not None):
+        return fill_histograms(array, vweights, vcodes, categories, **kwargs)
+    if vweights is not None:
+        kwargs = dict(kwargs, weights=vweights)
+    if ndim == 1:
+        return Hist1D(array, **kwargs)
+    elif ndim == 2:
+        return Hist2D(array, **kwargs)
+
+
+def _normalized_exprs(varexp, sel, weights, defines):
+    exprs = [
+        to_ak_expr(expr, aliases=defines) for expr in split_expr_on_free_colon(varexp)
+    ]
+    if isinstance(weights, dict):
+        weights = [(k, to_ak_expr(v, aliases=defines)) for k, v in weights.items()]
+    else:
+        weights = to_ak_expr(weights, aliases=defines)
+    return exprs + [to_ak_expr(sel, aliases=defines), weights]
+
+
+def _draw_cache_key(df, varexp, sel, weights, env, defines, to_array, by, kwargs):
+    defines = get_defines(df, defines)
+    colnames = _draw_variables(varexp, sel, weights, defines)
+    if by is not None:
+        colnames = colnames + [by]
+    columns = [c for c in colnames if c in df.columns]
+    columns += columns_to_read([c for c in colnames if c not in df.columns])
+    return make_key(
+        "draw",
+        _normalized_exprs(varexp, sel, weights, defines),
+        to_array,
+        by,
+        value_token(env),
+        value_token(kwargs),
+        dataframe_fingerprint(df, columns),
+    )
+
+
+def tree_draw(
+    df,
+    varexp,
+    sel="",
+    weights="",
+    to_array=False,
+    env=dict(),
+    defines=None,
+    nthreads=1,
+    chunk_rows=None,
+    cache=None,
+    by=None,
+    profile=False,
+    aggregate=None,
+    approx=None,
+    **kwargs,
+):
     """
     Draws a 1D or 2D histogram (or an array) from a pandas DataFrame.
 
     varexp: expression to draw
     sel: selection expression
-    weights: weight expression
+    weights: weight expression, or a dictionary of named weight expressions (e.g., systematic
+        variations) to get a `pdroot.histograms.HistogramDict` of histograms, one per weight,
+        evaluating the other expressions and finding the bins only once
     to_array: return an array if True, otherwise return a `yahist.Hist1D` or `yahist.Hist2D`
     env: dictionary of additional symbols needed to parse the expressions
+    defines: dictionary of additional lazily-defined columns (see `define`)
+    nthreads: if more than 1, split the rows into this many contiguous slices and evaluate them in parallel threads
+    chunk_rows: if specified, evaluate blocks of this many rows at a time, to bound the memory
+        used by intermediate arrays. With fixed `bins` (e.g., "50,0,100"), a histogram is filled
+        per block and the blocks are added up, otherwise the arrays are concatenated.
+    cache: `True` (to use `pdroot.cache.default_cache`) or a `pdroot.cache.DrawCache`. Results are
+        cached by the normalized expressions, binning, and a fingerprint of the columns used,
+        so redrawing the same thing on unchanged data returns a copy of the previous result.
+    by: name of a (string, categorical, or integer) column to get a `pdroot.histograms.HistogramDict`
+        with a histogram per category (keyed by (category, weight name) with a dictionary of `weights`),
+        evaluating the expressions and finding the bins only once. With `to_array`, the
+        category of each entry is returned as an additional array.
+    profile: for "x:y", return a `pdroot.histograms.Profile1D` with the mean of y in bins of x
+        (like ROOT's `TProfile`), accumulated during the fill without keeping the arrays
+    aggregate: like `profile`, with another per-bin aggregate of y ("mean", "std", "sum", "min", or "max")
+    approx: fraction of the rows to evaluate (in blocks spread evenly over the rows), to quickly get
+        a histogram scaled up to all the rows, with the statistical errors of the sample and the fraction
+        of rows used in `h.metadata["approx"]`. With `to_array`, the arrays of the sampled rows.
 
     >>> df.draw("Jet_pt", "MET_pt>40")
     >>> df.draw("Jet_pt", "MET_pt>40", to_array=True)
@@ -132,24 +551,103 @@ def tree_draw(df, varexp, sel="", weights="", to_array=False, env=dict(), **kwar
     >>> df.draw("1", "length(Jet_pt)>2")
     >>> df.draw("1", "length(Jet_pt[abs(Jet_eta)<2.4])>2")
     >>> df.draw("sum(-2.4<Jet_eta<2.4 and Jet_pt>25)")
+    >>> df.draw("mass(Jet_p4[0] + Jet_p4[1])", "length(Jet_pt) >= 2")
+    >>> df.draw("Jet_pt", "MET_pt>40", nthreads=8)
+    >>> df.draw("sum(Jet_pt[abs(Jet_eta)<2.4])", bins="100,0,1000", chunk_rows=1e6)
+    >>> df.draw("Jet_pt", "MET_pt>40", bins="50,0,200", cache=True)
+    >>> df.draw("MET_pt", bins="50,0,500", weights=dict(nominal="genWeight", up="genWeight*sf_up"))
+    >>> df.draw("MET_pt", bins="50,0,500", by="region")["SR1"]
+    >>> df.draw("nJet:MET_pt", bins="10,-0.5,9.5", profile=True).counts
+    >>> df.draw("MET_pt", bins="50,0,500", approx=0.01)
     """
-    array, vweights = _tree_draw_to_array(df, varexp, sel, weights, env)
+    if profile:
+        aggregate = aggregate or "mean"
+    if aggregate is not None:
+        # passed on to `_make_hist` (and part of the cache key) with the binning
+        kwargs = dict(kwargs, aggregate=aggregate)
+
+    store = get_cache(cache)
+    if store is not None:
+        key_kwargs = kwargs if approx is None else dict(kwargs, approx=approx)
+        key = _draw_cache_key(
+            df, varexp, sel, weights, env, defines, to_array, by, key_kwargs
+        )
+        result = store.get(key)
+        if result is None:
+            result = tree_draw(
+                df,
+                varexp,
+                sel,
+                weights,
+                to_array=to_array,
+                env=env,
+                defines=defines,
+                nthreads=nthreads,
+                chunk_rows=chunk_rows,
+                by=by,
+                approx=approx,
+                **kwargs,
+            )
+            store.put(key, result)
+        return copy_result(result)
+
+    categories = None
+    if by is not None:
+        # the same categories for every slice of rows
+        categories = _categories(df[by])
+        by = (by, categories)
+    args = (varexp, sel, weights, env, defines, by)
+
+    if isinstance(df, ChunkDataFrame) and (
+        (approx is not None) or chunk_rows or (nthreads > 1)
+    ):
+        # read the needed branches once (rather than once per slice), and to know the number of rows
+        _read_draw_columns(df, args)
+
+    slices = None
+    if approx is not None:
+        slices, fraction = _sampled_blocks(len(df), approx)
+    elif chunk_rows:
+        slices = _row_blocks(len(df), chunk_rows)
+    elif nthreads > 1:
+        slices = _row_slices(len(df), nthreads)
+
+    if (slices is None) or ((len(slices) == 1) and (approx is None)):
+        array, vweights, vcodes = _tree_draw_to_array(df, *args)
+    elif (
+        chunk_rows
+        and (approx is None)
+        and not to_array
+        and _fixed_bins(kwargs.get("bins"))
+    ):
+        return sum(
+            _evaluate_slices(
+                df,
+                args,
+                slices,
+                nthreads,
+                lambda result: _make_hist(*result, kwargs, categories),
+            )
+        )
+    else:
+        results = list(_evaluate_slices(df, args, slices, nthreads))
+        array, vweights, vcodes = _concatenate_results(results)
+
     if to_array:
+        out = (array,)
         if weights:
-            return array, vweights
-        return array
+            out += (vweights,)
+        if by is not None:
+            out += (np.asarray(pd.Categorical.from_codes(vcodes, categories)),)
+        return out if len(out) > 1 else array
 
-    if isinstance(array, tuple) and len(array) == 2:
-        ndim = 2
-    else:
-        ndim = np.ndim(array)
+    h = _make_hist(array, vweights, vcodes, kwargs, categories)
+    if approx is not None:
+        h = _scaled(h, fraction)
+    return h
 
-    if weights:
-        kwargs["weights"] = vweights
-    if ndim == 1:
-        return Hist1D(array, **kwargs)
-    elif ndim == 2:
-        return Hist2D(array, **kwargs)
+
+_tree_draw_parameters = inspect.signature(tree_draw).parameters
 
 
 def tree_adraw(*args, **kwargs):
@@ -160,6 +658,92 @@ def tree_adraw(*args, **kwargs):
     return tree_draw(*args, **kwargs)
 
 
+def _empty_result(varexp, opts):
+    """
+    Result of `tree_draw` with `opts` (which need fixed `bins`) when there are no entries
+    """
+    kwargs = {k: v for k, v in opts.items() if k not in _tree_draw_parameters}
+    aggregate = opts.get("aggregate") or ("mean" if opts.get("profile") else None)
+    if aggregate is not None:
+        kwargs["aggregate"] = aggregate
+    empty = np.zeros(0)
+    array = empty
+    if len(split_expr_on_free_colon(varexp)) == 2:
+        array = (empty, empty)
+    weights = opts.get("weights")
+    vweights = None
+    if isinstance(weights, dict):
+        vweights = {name: empty for name in weights}
+    if opts.get("by") is None:
+        return _make_hist(array, vweights, None, kwargs)
+    # no categories were found
+    return _make_hist(array, vweights, np.zeros(0, dtype=int), kwargs, categories=[])
+
+
+def _sum_hists(hists, varexp, opts, report=()):
+    """
+    Sum of the histograms of chunks or work units, or an empty histogram if there are none
+    (e.g., every unit was pruned, or failed and was skipped as listed in `report`)
+    """
+    if hists:
+        return sum(hists)
+    if not _fixed_bins(opts.get("bins")):
+        failed = [
+            f"{x['filename']} [{x['entry_start']}, {x['entry_stop']}): {x['error']}"
+            for x in report
+            if x.get("status") == "failed"
+        ]
+        raise ValueError(
+            "Nothing was drawn (no entries, or every work unit was pruned or failed), "
+            'and an empty histogram needs fixed `bins` (e.g., "50,0,100").'
+            + "".join(f"\nFailed work unit {x}" for x in failed)
+        )
+    return _empty_result(varexp, opts)
+
+
+def draw_work_unit(unit, varexp, sel, columns, opts):
+    """
+    Histogram of the entries in a `pdroot.executors.WorkUnit`
+    """
+    df = read_work_unit(unit, columns)
+    return tree_draw(df, varexp, sel, **opts)
+
+
+def _take_binning(units, opts, run):
+    """
+    Unless `opts` has fixed bins, runs `units` one at a time (`run` yields the histograms
+    of a list of units) until one gives a histogram, and takes its binning, so that the histograms
+    of the other units can be added. Returns the histograms and the units left to run.
+    """
+    hists = []
+    units = list(units)
+    while units and not hists and not _fixed_bins(opts.get("bins")):
+        hists.extend(run(units[:1]))
+        units = units[1:]
+        if hists:
+            opts["bins"] = hists[0].edges
+    return hists, units
+
+
+def _draw_columns_and_opts(varexp, sel, bins, defines, kwargs):
+    """
+    Branches to read and options of `tree_draw` for drawing from files
+    """
+    weights = kwargs.get("weights", "")
+    colnames = _draw_variables(varexp, sel, weights, defines or dict())
+    if kwargs.get("by") is not None:
+        colnames = colnames + [kwargs["by"]]
+    columns = columns_to_read(colnames)
+
+    opts = dict()
+    if bins is not None:
+        opts["bins"] = bins
+    if defines:
+        opts["defines"] = defines
+    opts.update(kwargs)
+    return columns, opts
+
+
 def iter_draw(
     path,
     varexp,
@@ -169,20 +753,172 @@ def iter_draw(
     progress=True,
     step_size="50MB",
     nthreads=4,
+    defines=None,
+    cache=None,
+    incremental=None,
+    executor=None,
+    checkpoint=None,
+    retries=0,
+    on_error="raise",
+    prune=False,
+    approx=None,
     **kwargs,
 ):
     """
-    Loop over specified ROOT files in `path` in chunks, making histograms and returning their sum.
+    Loop over specified ROOT (or Parquet/Arrow IPC) files in `path` in chunks,
+    making histograms and returning their sum.
     Tree name is specified via `treename`.
     Iterates over the files in chunks of `step_size` (as per `uproot4.iterate`), reading
     only the branches deemed necessary according to `pdroot.parse.variables_in_expr`.
+    `defines` is a dictionary of lazily-defined columns (see `define`).
+    `cache` is `True` or a `pdroot.cache.DrawCache` (see `tree_draw`), where the input is
+    identified by the UUIDs and number of entries of the files.
+    `incremental` is a directory (or `pdroot.cache.DrawCache`) in which to store a partial histogram
+    per file. On reruns, only new or changed files are processed and their histograms are added to
+    the stored ones. This requires fixed `bins`.
+    `executor` distributes the work units (a file and an entry range) to threads, processes, or
+    workers on other hosts (see `pdroot.executors`), which each return a histogram to be added up.
+    `checkpoint`, `retries`, `on_error` make the processing fault-tolerant and resumable (see
+    `pdroot.executors.run_work_units`): the histogram of each work unit is stored in the `checkpoint`
+    directory, so that a rerun only processes units that weren't finished, and failing units are
+    retried and then raise or are skipped. A report of the status and time taken for each unit
+    (e.g., to spot slow files) is put in `h.metadata["report"]`.
+    `prune=True` skips entry ranges which can't pass comparisons of columns with numbers in `sel`
+    (e.g., "MET_pt > 300 and run == 325000"), according to the row group statistics of Parquet
+    files or the statistics index of ROOT files (see `pdroot.stats.build_stats_index`).
+    With `by` (see `tree_draw`), the result has a histogram for each category found in any chunk.
+    `approx` is a fraction of the entries to process, sampled as work units of `step_size` spread
+    evenly over all the files, to quickly get a histogram scaled up to all the entries
+    (see `iter_draw_progressive`).
+
+    >>> iter_draw("nano_*.root", "MET_pt", bins="50,0,500", incremental="partials/")
+    >>> iter_draw("nano_*.root", "MET_pt", bins="50,0,500", executor="processes")
+    >>> h = iter_draw("nano_*.root", "MET_pt", bins="50,0,500", checkpoint="ckpt/", on_error="skip")
+    >>> pd.DataFrame(h.metadata["report"]).sort_values("seconds")
+    >>> iter_draw("nano_*.root", "MET_pt", bins="50,0,500", step_size=100000, approx=0.01)
     """
-    columns = variables_in_expr(f"{varexp}${sel}")
+    iter_opts = dict(
+        treename=treename,
+        bins=bins,
+        progress=progress,
+        step_size=step_size,
+        nthreads=nthreads,
+        defines=defines,
+        executor=executor,
+        checkpoint=checkpoint,
+        retries=retries,
+        on_error=on_error,
+        prune=prune,
+    )
+    iter_opts.update(kwargs)
+    # identifies the histogram independently of the input
+    token = (
+        _normalized_exprs(varexp, sel, kwargs.get("weights", ""), defines or dict()),
+        value_token(bins),
+        value_token(kwargs),
+    )
 
-    opts = dict()
-    if bins is not None:
-        opts["bins"] = bins
-    opts.update(kwargs)
+    store = get_cache(cache)
+    if store is not None:
+        key = make_key(
+            "iter_draw",
+            [file_fingerprint(*x) for x in expand_path(path, treename)],
+            token if approx is None else token + (approx,),
+        )
+        h = store.get(key)
+        if h is None:
+            h = iter_draw(
+                path, varexp, sel, incremental=incremental, approx=approx, **iter_opts
+            )
+            store.put(key, h)
+        return copy_result(h)
+
+    if approx is not None:
+        # (reading is done by the work units, not by `iter_chunks` threads)
+        opts = {k: v for k, v in iter_opts.items() if k != "nthreads"}
+        hists = list(
+            iter_draw_progressive(path, varexp, sel, fractions=[approx], **opts)
+        )
+        return hists[-1] if hists else _sum_hists([], varexp, dict(kwargs, bins=bins))
+
+    if incremental is not None:
+        if not _fixed_bins(bins):
+            raise ValueError(
+                'Incremental mode needs fixed `bins` (e.g., "50,0,100"), '
+                "so that histograms of separate files can be added."
+            )
+        if isinstance(incremental, str):
+            incremental = DrawCache(path=incremental)
+        store = get_cache(incremental)
+
+        hists = []
+        new_files = []
+        for fname, tname in expand_path(path, treename):
+            key = make_key("iter_draw_file", file_fingerprint(fname, tname), token)
+            h = store.get(key)
+            if h is None:
+                new_files.append((fname, tname, key))
+            else:
+                hists.append(h)
+        if progress:
+            print(
+                f"Reusing {len(hists)} stored partial histograms, "
+                f"processing {len(new_files)} new or changed files"
+            )
+        for fname, tname, key in new_files:
+            h = iter_draw(fname, varexp, sel, **dict(iter_opts, treename=tname))
+            store.put(key, h)
+            hists.append(h)
+        return copy_result(sum(hists))
+
+    columns, opts = _draw_columns_and_opts(varexp, sel, bins, defines, kwargs)
+
+    if (
+        (executor is not None)
+        or checkpoint
+        or retries
+        or (on_error != "raise")
+        or is_arrow_path(path)
+        or prune
+    ):
+        # files that can't be opened fail (as per `on_error`) when processed
+        units = make_work_units(path, treename, step_size, columns, on_error="skip")
+        if prune:
+            units = prune_work_units(units, sel, exclude=defines or dict())
+        policy = dict(checkpoint=checkpoint, retries=retries, on_error=on_error)
+        report = []
+        hists, units = _take_binning(
+            units,
+            opts,
+            lambda first: run_work_units(
+                draw_work_unit,
+                first,
+                varexp,
+                sel,
+                columns,
+                opts,
+                report=report,
+                **policy,
+            ),
+        )
+        iterable = run_work_units(
+            draw_work_unit,
+            units,
+            varexp,
+            sel,
+            columns,
+            opts,
+            executor=executor,
+            report=report,
+            **policy,
+        )
+        if progress:
+            iterable = tqdm(iterable, total=len(units))
+        hists.extend(iterable)
+        h = _sum_hists(hists, varexp, opts, report)
+        if checkpoint or retries or (on_error != "raise"):
+            h.metadata["report"] = report
+        return h
 
     hists = []
     for df in iter_chunks(
@@ -197,5 +933,97 @@ def iter_draw(
         if "bins" not in opts:
             opts["bins"] = h.edges
         hists.append(h)
-    h = sum(hists)
+    h = _sum_hists(hists, varexp, opts)
     return h
+
+
+def iter_draw_progressive(
+    path,
+    varexp,
+    sel="",
+    fractions=(0.01, 0.1, 1.0),
+    treename="t",
+    bins=None,
+    progress=False,
+    step_size="50MB",
+    defines=None,
+    executor=None,
+    checkpoint=None,
+    retries=0,
+    on_error="raise",
+    prune=False,
+    **kwargs,
+):
+    """
+    Yields histograms of increasing `fractions` of the entries in `path`, each scaled up to all
+    the entries (with the statistical errors of the sample, and the fraction of entries used
+    in `h.metadata["approx"]`). The work units (entry ranges of `step_size`) are sampled evenly over
+    all the files (after pruning them with `prune`), and each histogram adds the units of the previous
+    ones to new ones, so a final fraction of 1 gives the exact histogram for the cost of a single `iter_draw`.
+    Other arguments are as for `iter_draw`.
+
+    >>> for h in iter_draw_progressive("nano_*.root", "MET_pt", bins="50,0,500", step_size=100000):
+    ...     print(h.metadata["approx"], h.integral)
+    """
+    columns, opts = _draw_columns_and_opts(varexp, sel, bins, defines, kwargs)
+    units = make_work_units(path, treename, step_size, columns, on_error="skip")
+    if prune:
+        units = prune_work_units(units, sel, exclude=defines or dict())
+    units = [units[i] for i in _stratified_order(len(units))]
+    # files that couldn't be opened (`entry_stop=None`) count as empty
+    entries = np.array([(u.entry_stop or 0) - u.entry_start for u in units])
+    total = entries.sum()
+
+    owned = isinstance(executor, str) or (executor is None)
+    executor = get_executor(executor or "serial")
+    policy = dict(checkpoint=checkpoint, retries=retries, on_error=on_error)
+    report = []
+    h = None
+    done = 0
+    try:
+        for fraction in sorted(fractions):
+            if not (0 < fraction <= 1):
+                raise ValueError(f"fractions must be in (0, 1], not {fraction}")
+            stop = max(int(np.ceil(fraction * len(units))), 1)
+            if stop <= done:
+                continue
+            first, batch = _take_binning(
+                units[done:stop],
+                opts,
+                lambda first: run_work_units(
+                    draw_work_unit,
+                    first,
+                    varexp,
+                    sel,
+                    columns,
+                    opts,
+                    report=report,
+                    **policy,
+                ),
+            )
+            if first:
+                h = first[0]
+            iterable = run_work_units(
+                draw_work_unit,
+                batch,
+                varexp,
+                sel,
+                columns,
+                opts,
+                executor=executor,
+                report=report,
+                **policy,
+            )
+            if progress:
+                iterable = tqdm(iterable, total=len(batch))
+            for result in iterable:
+                h = result if h is None else h + result
+            done = stop
+            if h is not None:
+                out = _scaled(h, entries[:done].sum() / max(total, 1))
+                if checkpoint or retries or (on_error != "raise"):
+                    out.metadata["report"] = list(report)
+                yield out
+    finally:
+        if owned:
+            executor.close()
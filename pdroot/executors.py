@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import collections
+import concurrent.futures
+import multiprocessing
+from multiprocessing.connection import Listener, Client, wait
+
+import uproot4
+
+from .readwrite import (
+    awkward1_arrays_to_dataframe,
+    is_arrow_filename,
+    arrow_row_groups,
+    read_arrow,
+)
+from .cache import expand_path, DrawCache, make_key, value_token
+
+# Executors run a function over a list of work units (a file and an entry range) and yield
+# the results in order. Only the function (by reference), the unit, and small arguments like
+# expression strings are shipped to workers; each worker reads its own entries from the file.
+
+WorkUnit = collections.namedtuple(
+    "WorkUnit", ["filename", "treename", "entry_start", "entry_stop"]
+)
+
+
+def _tree_entries_and_step(fname, treename, step_size, columns):
+    with uproot4.open(fname) as f:
+        tree = f[treename]
+        if isinstance(step_size, str):
+            kwargs = dict(filter_name=columns) if columns else dict()
+            return tree.num_entries, tree.num_entries_for(step_size, **kwargs)
+        return tree.num_entries, int(step_size)
+
+
+def make_work_units(
+    path, treename="t", step_size="50MB", columns=None, on_error="raise"
+):
+    """
+    Splits the files in `path` (which may contain a glob and/or a ":treename" suffix)
+    into `WorkUnit`s of `step_size` entries (or an amount of memory like "50MB",
+    estimated from the `columns` to be read). For Parquet/Arrow files, a `step_size`
+    given as memory means one unit per row group.
+    With `on_error="skip"`, a file that can't be opened becomes a single unit
+    (with `entry_stop=None`) which fails when it's processed, rather than raising here.
+    """
+    units = []
+    for fname, tname in expand_path(path, treename):
+        try:
+            if is_arrow_filename(fname):
+                ranges = arrow_row_groups(fname)
+                num_entries = ranges[-1][1] if ranges else 0
+                step = None if isinstance(step_size, str) else int(step_size)
+            else:
+                num_entries, step = _tree_entries_and_step(
+                    fname, tname, step_size, columns
+                )
+        except Exception:
+            if on_error != "skip":
+                raise
+            units.append(WorkUnit(fname, tname, 0, None))
+            continue
+        if step is None:
+            # one unit per row group
+            units.extend(WorkUnit(fname, tname, a, b) for a, b in ranges)
+            continue
+        step = max(step, 1)
+        for entry_start in range(0, num_entries, step):
+            entry_stop = min(entry_start + step, num_entries)
+            units.append(WorkUnit(fname, tname, entry_start, entry_stop))
+    return units
+
+
+def read_work_unit(unit, columns=None):
+    """
+    Reads the entries of a `WorkUnit` into a DataFrame
+    """
+    if is_arrow_filename(unit.filename):
+        return read_arrow(unit.filename, columns, unit.entry_start, unit.entry_stop)
+    with uproot4.open(unit.filename) as f:
+        kwargs = dict(filter_name=columns) if columns else dict()
+        arrays = f[unit.treename].arrays(
+            entry_start=unit.entry_start, entry_stop=unit.entry_stop, **kwargs
+        )
+    return awkward1_arrays_to_dataframe(arrays)
+
+
+class SerialExecutor:
+    """
+    Runs everything in the current thread
+    """
+
+    def map(self, func, items, *args):
+        for item in items:
+            yield func(item, *args)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _PoolExecutor(SerialExecutor):
+    pool_class = None
+
+    def __init__(self, nworkers=4, prefetch=None):
+        self.nworkers = nworkers
+        self.prefetch = prefetch or 2 * nworkers
+        self._pool = None
+
+    def map(self, func, items, *args):
+        if self._pool is None:
+            self._pool = self.pool_class(self.nworkers)
+        # at most `prefetch` units in flight, so that results (e.g., chunks) that are
+        # consumed slowly don't pile up in memory
+        pending = collections.deque()
+        try:
+            for item in items:
+                pending.append(self._pool.submit(func, item, *args))
+                if len(pending) >= self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class ThreadExecutor(_PoolExecutor):
+    """
+    Runs work units in a pool of `nworkers` threads, with at most `prefetch`
+    (default of twice `nworkers`) results in flight
+    """
+
+    pool_class = concurrent.futures.ThreadPoolExecutor
+
+
+class ProcessExecutor(_PoolExecutor):
+    """
+    Runs work units in a pool of `nworkers` processes, with at most `prefetch`
+    (default of twice `nworkers`) results in flight
+    """
+
+    pool_class = concurrent.futures.ProcessPoolExecutor
+
+
+class SocketExecutor(SerialExecutor):
+    """
+    Sends work units to workers connected over sockets, which can be started on other hosts with
+        python -m pdroot.executors <host>:<port> --authkey <authkey>
+    (they need access to the same files). `local_workers` worker processes are started
+    on this host, and `remote_workers` more connections are waited for.
+    `authkey` is required, since work units and results are pickled: anyone with it can run code
+    on the workers and on this host, so use a random key (e.g., `os.urandom(32)`) and keep it private.
+
+    >>> authkey = os.environ["PDROOT_AUTHKEY"].encode()
+    >>> with SocketExecutor(("node01", 6000), authkey, local_workers=4, remote_workers=8) as executor:
+    ...     h = iter_draw("/data/nano_*.root", "MET_pt", bins="50,0,500", executor=executor)
+    """
+
+    def __init__(
+        self,
+        address=("localhost", 0),
+        authkey=None,
+        local_workers=2,
+        remote_workers=0,
+    ):
+        if not authkey:
+            raise ValueError("An authkey is required.")
+        if local_workers + remote_workers < 1:
+            raise ValueError("Need at least one worker.")
+        self.authkey = authkey
+        self.local_workers = local_workers
+        self.remote_workers = remote_workers
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._processes = []
+        self._connections = []
+
+    def _connect(self):
+        if self._connections:
+            return
+        for _ in range(self.local_workers):
+            process = multiprocessing.Process(
+                target=run_worker, args=(self.address, self.authkey), daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        for _ in range(self.local_workers + self.remote_workers):
+            self._connections.append(self._listener.accept())
+
+    def map(self, func, items, *args):
+        self._connect()
+        items = list(items)
+        todo = collections.deque(range(len(items)))
+        busy = dict()
+        results = dict()
+        idle = list(self._connections)
+        inext = 0
+        try:
+            while inext < len(items):
+                # keep every connected worker busy with one task
+                while idle and todo:
+                    conn, i = idle.pop(), todo.popleft()
+                    conn.send((func, items[i], args))
+                    busy[conn] = i
+                if not busy:
+                    raise RuntimeError("All workers have disconnected.")
+                for conn in wait(list(busy)):
+                    i = busy.pop(conn)
+                    try:
+                        ok, result = conn.recv()
+                    except (EOFError, OSError):
+                        # lost a worker, so give its task to another one
+                        self._connections.remove(conn)
+                        todo.appendleft(i)
+                        continue
+                    if not ok:
+                        raise RuntimeError(f"Work unit {items[i]} failed:\n{result}")
+                    results[i] = result
+                    idle.append(conn)
+                while inext in results:
+                    yield results.pop(inext)
+                    inext += 1
+        finally:
+            # don't leave results of abandoned tasks behind for the next call
+            for conn in busy:
+                try:
+                    conn.recv()
+                except (EOFError, OSError):
+                    self._connections.remove(conn)
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.send(None)
+                conn.close()
+            except OSError:
+                pass
+        self._connections = []
+        for process in self._processes:
+            process.join(timeout=5)
+        self._processes = []
+        self._listener.close()
+
+
+def run_worker(address, authkey):
+    """
+    Connects to a `SocketExecutor` at `address` and runs the tasks it sends until told to stop
+    """
+    conn = Client(address, authkey=authkey)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        func, item, args = task
+        try:
+            conn.send((True, func(item, *args)))
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+    conn.close()
+
+
+def _run_unit(unit, func, retries, *args):
+    """
+    Runs `func(unit, *args)`, trying up to `retries` more times if it raises.
+    Returns (success, result or traceback, seconds, attempts).
+    """
+    t0 = time.time()
+    for attempt in range(1, retries + 2):
+        try:
+            return True, func(unit, *args), time.time() - t0, attempt
+        except Exception:
+            error = traceback.format_exc()
+    return False, error, time.time() - t0, attempt
+
+
+def _file_stat(fname):
+    if not os.path.exists(fname):
+        return None
+    stat = os.stat(fname)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def run_work_units(
+    func,
+    units,
+    *args,
+    executor=None,
+    checkpoint=None,
+    retries=0,
+    on_error="raise",
+    report=None,
+):
+    """
+    Yields `func(unit, *args)` for each work unit (in order), with
+        executor: as for `iter_draw` (default runs serially)
+        checkpoint: directory in which the result of each unit is stored as soon as it's done.
+            When rerun (e.g., after a crash), units with a stored result (for the same function,
+            arguments, and unmodified file) are not rerun.
+        retries: number of times to retry a unit that raised an exception (e.g., from unreadable baskets)
+        on_error: "raise" to raise a `RuntimeError` for a unit that still fails, or "skip" to leave it out
+        report: if a list is given, a dictionary per unit is appended to it with the
+            status ("done", "reused", or "failed"), time taken, number of attempts, and error
+
+    >>> report = []
+    >>> skims = run_work_units(skim, units, checkpoint="skims/", on_error="skip", report=report)
+    >>> pd.DataFrame(report).sort_values("seconds").tail()
+    """
+    if on_error not in ["raise", "skip"]:
+        raise ValueError(f"on_error must be 'raise' or 'skip', not {on_error!r}")
+    if report is None:
+        report = []
+    store = DrawCache(maxsize=0, path=checkpoint) if checkpoint else None
+    name = f"{func.__module__}.{func.__qualname__}"
+    keys = [
+        make_key(
+            "work_unit", name, tuple(unit), _file_stat(unit.filename), value_token(args)
+        )
+        for unit in units
+    ]
+
+    todo = [i for i, key in enumerate(keys) if (store is None) or (key not in store)]
+    owned = isinstance(executor, str) or (executor is None)
+    executor = get_executor(executor or "serial")
+    results = executor.map(_run_unit, [units[i] for i in todo], func, retries, *args)
+    todo = set(todo)
+    try:
+        for i, unit in enumerate(units):
+            entry = dict(unit._asdict(), seconds=0.0, attempts=0, error=None)
+            report.append(entry)
+            if i not in todo:
+                entry["status"] = "reused"
+                yield store.get(keys[i])
+                continue
+            ok, result, entry["seconds"], entry["attempts"] = next(results)
+            if not ok:
+                entry["status"] = "failed"
+                entry["error"] = result
+                if on_error == "raise":
+                    raise RuntimeError(f"Work unit {unit} failed:\n{result}")
+                continue
+            entry["status"] = "done"
+            if store is not None:
+                store.put(keys[i], result)
+            yield result
+    finally:
+        results.close()
+        if owned:
+            executor.close()
+        if checkpoint:
+            with open(os.path.join(checkpoint, "report.json"), "w") as fh:
+                json.dump(report, fh, indent=1)
+
+
+def get_executor(executor):
+    """
+    Returns an executor given an executor or one of
+    "serial", "threads", "processes" (with the default number of workers)
+    """
+    if isinstance(executor, str):
+        executor = dict(
+            serial=SerialExecutor, threads=ThreadExecutor, processes=ProcessExecutor
+        )[executor]()
+    return executor
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Runs a worker for a SocketExecutor")
+    parser.add_argument("address", help="host:port of the SocketExecutor")
+    parser.add_argument("--authkey", required=True, help="authentication key")
+    args = parser.parse_args(args)
+    host, port = args.address.rsplit(":", 1)
+    run_worker((host, int(port)), args.authkey.encode())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
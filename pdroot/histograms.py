@@ -0,0 +1,280 @@
+import numpy as np
+from yahist import Hist1D, Hist2D
+from yahist.utils import has_uniform_spacing
+
+# Filling several histograms of the same values (e.g., one per systematic weight variation or category)
+# by computing the bin of each entry once and then summing the weights per bin with `np.bincount`.
+# Profiles (per-bin aggregates of a second variable) are filled the same way, from per-bin sums.
+
+
+class HistogramDict(dict):
+    """
+    Dictionary of histograms with the same binning (e.g., from `df.draw` with a dictionary
+    of `weights` or with `by`), which can be added and copied like a single histogram.
+    Adding takes the union of the keys (e.g., categories only present in some chunks).
+
+    >>> hists = df.draw("MET_pt", bins="50,0,500", weights=dict(nominal="genWeight", up="genWeight*1.1"))
+    >>> hists["up"] / hists["nominal"]
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metadata = dict()
+
+    @property
+    def edges(self):
+        return next(iter(self.values())).edges
+
+    def copy(self):
+        out = HistogramDict((name, h.copy()) for name, h in self.items())
+        out.metadata.update(self.metadata)
+        return out
+
+    def __add__(self, other):
+        if isinstance(other, (int, float)) and (other == 0):
+            # e.g., the start value of `sum(...)`
+            return self.copy()
+        out = self.copy()
+        for name, h in other.items():
+            out[name] = (out[name] + h) if (name in out) else h.copy()
+        return out
+
+    __radd__ = __add__
+
+    def __mul__(self, factor):
+        out = HistogramDict((name, h * factor) for name, h in self.items())
+        out.metadata.update(self.metadata)
+        return out
+
+    __rmul__ = __mul__
+
+
+def bin_indices(values, edges, overflow=True):
+    """
+    Index of the bin with the given `edges` for each of the `values`, or -1 for
+    values outside of the edges (which go into the outermost bins with `overflow`, as for `yahist`)
+
+    >>> bin_indices(np.array([-1, 0.5, 1.5, 2, np.nan]), np.array([0.0, 1.0, 2.0]))
+    array([0, 0, 1, 1, 1])
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nbins = len(edges) - 1
+    if has_uniform_spacing(edges):
+        # same arithmetic as the regular axis of boost-histogram (used by yahist)
+        index = np.floor((values - edges[0]) / (edges[-1] - edges[0]) * nbins)
+    else:
+        index = np.searchsorted(edges, values, side="right") - 1.0
+    # NaN goes into the overflow
+    index = np.clip(np.nan_to_num(index, nan=nbins), -1, nbins).astype(np.int64)
+    if overflow:
+        return np.clip(index, 0, nbins - 1)
+    index[index == nbins] = -1
+    return index
+
+
+def fill_histograms(array, weights=None, codes=None, categories=None, **kwargs):
+    """
+    `HistogramDict` of histograms of `array` (or a tuple of two arrays for 2D) with the same
+    binning, finding the bin of each entry only once. There's a histogram for each of the named
+    `weights` arrays if it's a dictionary, and/or for each of the `categories` if `codes` are given
+    (per entry, the index of its category, or -1 to leave it out), keyed by (category, weight name)
+    if both. `kwargs` (e.g., `bins`) are as for `yahist.Hist1D`/`yahist.Hist2D`.
+    """
+    cls = Hist2D if isinstance(array, tuple) else Hist1D
+    # binning as per yahist
+    template = cls(array, **kwargs)
+    overflow = kwargs.get("overflow", True)
+    if cls is Hist1D:
+        index = bin_indices(array, template.edges, overflow)
+        shape = template.counts.shape
+    else:
+        xedges, yedges = template.edges
+        ix = bin_indices(array[0], xedges, overflow)
+        iy = bin_indices(array[1], yedges, overflow)
+        # yahist stores 2D counts as (y, x)
+        shape = (len(yedges) - 1, len(xedges) - 1)
+        index = np.where((ix < 0) | (iy < 0), -1, iy * shape[1] + ix)
+    size = int(np.prod(shape))
+    ncategories = 1
+    if codes is not None:
+        ncategories = len(categories)
+        codes = np.asarray(codes)
+        index = np.where((index < 0) | (codes < 0), -1, codes * size + index)
+    valid = index >= 0
+    if not valid.all():
+        index = index[valid]
+
+    named = weights if isinstance(weights, dict) else {None: weights}
+    out = HistogramDict()
+    for name, w in named.items():
+        if w is None:
+            sumw = sumw2 = np.bincount(index, minlength=ncategories * size)
+        else:
+            w = np.asarray(w, dtype=np.float64)
+            if not valid.all():
+                w = w[valid]
+            sumw = np.bincount(index, weights=w, minlength=ncategories * size)
+            sumw2 = np.bincount(index, weights=w * w, minlength=ncategories * size)
+        sumw = sumw.reshape((ncategories,) + shape).astype(np.float64)
+        errors = np.sqrt(sumw2).reshape((ncategories,) + shape)
+        for i in range(ncategories):
+            if codes is None:
+                key = name
+            elif name is None:
+                key = categories[i]
+            else:
+                key = (categories[i], name)
+            h = template.copy()
+            # as in `yahist.Hist1D.from_bincounts`
+            h._counts = sumw[i]
+            h._errors = errors[i]
+            out[key] = h
+    return out
+
+
+def _binned_extremes(index, values, size):
+    """
+    Min and max of `values` for each bin `index` (inf/-inf for empty bins)
+    """
+    order = np.lexsort((values, index))
+    sorted_index = index[order]
+    bins = np.arange(size)
+    starts = np.searchsorted(sorted_index, bins, side="left")
+    stops = np.searchsorted(sorted_index, bins, side="right")
+    nonempty = stops > starts
+    minimum = np.full(size, np.inf)
+    maximum = np.full(size, -np.inf)
+    minimum[nonempty] = values[order[starts[nonempty]]]
+    maximum[nonempty] = values[order[stops[nonempty] - 1]]
+    return minimum, maximum
+
+
+class Profile1D:
+    """
+    Aggregate of values `y` in bins of `x` (like ROOT's `TProfile`), kept as per-bin sums
+    (of weights, squared weights, weight*y and weight*y^2, and the min/max of y if needed),
+    so that profiles of separate chunks can be added. `counts` is the `aggregate` per bin:
+    "mean" (with the error on the mean as `errors`), "std", "sum", "min", or "max".
+    Empty bins are 0. `to_hist1d()` gives a `yahist.Hist1D` (e.g., for plotting).
+
+    >>> p = df.draw("nJet:MET_pt", bins="10,-0.5,9.5", profile=True)
+    >>> p.counts, p.errors
+    """
+
+    aggregates = ["mean", "std", "sum", "min", "max"]
+
+    def __init__(self, edges, sums, extremes=None, aggregate="mean", metadata=None):
+        if aggregate not in self.aggregates:
+            raise ValueError(f"aggregate must be one of {self.aggregates}")
+        self.edges = np.asarray(edges)
+        # (sumw, sumw2, sumwy, sumwy2) per bin
+        self.sums = np.asarray(sums, dtype=np.float64)
+        # (min, max) per bin
+        self.extremes = extremes
+        self.aggregate = aggregate
+        self.metadata = dict(metadata or dict())
+
+    @classmethod
+    def fill(cls, x, y, weights=None, aggregate="mean", **kwargs):
+        """
+        Profile of `y` in bins of `x`, with binning `kwargs` as for `yahist.Hist1D`
+        """
+        template = Hist1D(x, **kwargs)
+        index = bin_indices(x, template.edges, kwargs.get("overflow", True))
+        valid = index >= 0
+        size = len(template.edges) - 1
+        y = np.asarray(y, dtype=np.float64)[valid]
+        w = np.ones(len(y)) if weights is None else np.asarray(weights)[valid]
+        index = index[valid]
+        sums = [
+            np.bincount(index, weights=v, minlength=size)
+            for v in [w, w * w, w * y, w * y * y]
+        ]
+        extremes = None
+        if aggregate in ["min", "max"]:
+            extremes = np.array(_binned_extremes(index, y, size))
+        return cls(template.edges, sums, extremes, aggregate, template.metadata)
+
+    @property
+    def bin_centers(self):
+        return 0.5 * (self.edges[1:] + self.edges[:-1])
+
+    @property
+    def entries(self):
+        """
+        Sum of weights per bin
+        """
+        return self.sums[0]
+
+    def _mean_and_variance(self):
+        sumw, _, sumwy, sumwy2 = self.sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(sumw != 0, sumwy / sumw, 0.0)
+            variance = np.where(sumw != 0, sumwy2 / sumw - mean ** 2, 0.0)
+        return mean, np.maximum(variance, 0.0)
+
+    @property
+    def counts(self):
+        if self.aggregate == "sum":
+            return self.sums[2]
+        if self.aggregate in ["min", "max"]:
+            values = self.extremes[self.aggregates.index(self.aggregate) - 3]
+            return np.where(np.isfinite(values), values, 0.0)
+        mean, variance = self._mean_and_variance()
+        return mean if self.aggregate == "mean" else np.sqrt(variance)
+
+    @property
+    def errors(self):
+        if self.aggregate != "mean":
+            return np.zeros(len(self.edges) - 1)
+        sumw, sumw2 = self.sums[:2]
+        _, variance = self._mean_and_variance()
+        # effective number of entries
+        with np.errstate(divide="ignore", invalid="ignore"):
+            neff = np.where(sumw2 != 0, sumw ** 2 / sumw2, 0.0)
+            return np.where(neff != 0, np.sqrt(variance / neff), 0.0)
+
+    def to_hist1d(self):
+        return Hist1D.from_bincounts(
+            self.counts, self.edges, errors=self.errors, metadata=self.metadata
+        )
+
+    def copy(self):
+        extremes = None if self.extremes is None else self.extremes.copy()
+        return Profile1D(
+            self.edges.copy(), self.sums.copy(), extremes, self.aggregate, self.metadata
+        )
+
+    def __add__(self, other):
+        if isinstance(other, (int, float)) and (other == 0):
+            # e.g., the start value of `sum(...)`
+            return self.copy()
+        if (len(self.edges) != len(other.edges)) or not np.allclose(
+            self.edges, other.edges
+        ):
+            raise ValueError("Can't add profiles with different binning.")
+        extremes = None
+        if self.extremes is not None:
+            extremes = np.array(
+                [
+                    np.minimum(self.extremes[0], other.extremes[0]),
+                    np.maximum(self.extremes[1], other.extremes[1]),
+                ]
+            )
+        return Profile1D(
+            self.edges, self.sums + other.sums, extremes, self.aggregate, self.metadata
+        )
+
+    __radd__ = __add__
+
+    def __mul__(self, factor):
+        # as if each entry had `factor` times its weight (so the means don't change)
+        out = self.copy()
+        out.sums = out.sums * np.array([factor, factor ** 2, factor, factor])[:, None]
+        return out
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        nbins = len(self.edges) - 1
+        return f"Profile1D(aggregate={self.aggregate!r}, nbins={nbins})"
@@ -0,0 +1,141 @@
+import numpy as np
+import awkward1
+
+# Jagged-array kernels written as numpy arithmetic on offsets, so that the per-row loops
+# happen in vectorized index computations and the (possibly record) content is never copied,
+# only gathered via `IndexedArray`s.
+
+
+def offsets_and_content(array):
+    """
+    Returns a numpy array of offsets (starting at 0) and the flattened content
+    of a jagged awkward1 array. Rows which are None are treated as empty.
+    """
+    layout = array.layout
+    if isinstance(layout, awkward1.layout.ListOffsetArray64):
+        offsets = np.asarray(layout.offsets)
+        if offsets[0] == 0:
+            content = awkward1.Array(
+                layout.content[: offsets[-1]], behavior=array.behavior
+            )
+            return offsets, content
+    counts = awkward1.num(array, axis=1)
+    if isinstance(counts, awkward1.Array):
+        counts = awkward1.fill_none(counts, 0)
+    offsets = _counts_to_offsets(np.asarray(counts))
+    return offsets, awkward1.flatten(array, axis=1)
+
+
+def _gather_jagged(offsets, index, content):
+    """
+    Jagged array with the given `offsets` whose elements are `content[index]`
+    (without copying `content`)
+    """
+    layout = awkward1.layout.ListOffsetArray64(
+        awkward1.layout.Index64(offsets),
+        awkward1.layout.IndexedArray64(
+            awkward1.layout.Index64(index.astype(np.int64)), content.layout
+        ),
+    )
+    return awkward1.Array(layout, behavior=content.behavior)
+
+
+def _local_index(offsets):
+    """
+    For each element in the content, the index within its row
+    """
+    counts = np.diff(offsets)
+    return np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+
+
+def _counts_to_offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def index(array, i):
+    """
+    The `i`th element of each row (counting from the end for negative `i`),
+    or None for rows that are too short. Equivalent to
+    `ak.pad_none(array, abs(i), clip=...)[:, i]` without making a padded copy.
+
+    >>> index(Jet_pt, 0)
+    [42, None, 10.5, 50]
+    >>> index(Jet_pt, -2)
+    [15, None, None, 50]
+    """
+    offsets, content = offsets_and_content(array)
+    counts = np.diff(offsets)
+    if i >= 0:
+        position = offsets[:-1] + i
+        valid = counts > i
+    else:
+        position = offsets[1:] + i
+        valid = counts >= -i
+    layout = awkward1.layout.IndexedOptionArray64(
+        awkward1.layout.Index64(np.where(valid, position, -1).astype(np.int64)),
+        content.layout,
+    )
+    return awkward1.Array(layout, behavior=content.behavior)
+
+
+def combinations(array, n=2):
+    """
+    All unique combinations of `n` elements within each row, returned as a tuple
+    of `n` jagged arrays (first elements, second elements, ...), so that they can
+    be unpacked into functions.
+
+    >>> combinations(Jet_pt, 2)
+    ([[42, 42, 15], [], [], [50]], [[15, 10.5, 10.5], [], [], [5]])
+    >>> mass(*combinations(Muon_p4, 2))
+    """
+    if n != 2:
+        return tuple(awkward1.unzip(awkward1.combinations(array, n)))
+
+    offsets, content = offsets_and_content(array)
+    counts = np.diff(offsets)
+
+    # element i in a row with c elements pairs up with the c-1-i elements after it
+    npartners = np.repeat(counts, counts) - 1 - _local_index(offsets)
+    first = np.repeat(np.arange(offsets[-1]), npartners)
+    second = first + 1 + _local_index(_counts_to_offsets(npartners))
+
+    pair_offsets = _counts_to_offsets(counts * (counts - 1) // 2)
+    return (
+        _gather_jagged(pair_offsets, first, content),
+        _gather_jagged(pair_offsets, second, content),
+    )
+
+
+def cartesian(a, b):
+    """
+    All pairs of one element from `a` and one from `b` within each row, returned
+    as a tuple of two jagged arrays (elements from `a`, elements from `b`).
+
+    >>> min(delta_r(*cartesian(Jet_p4, Muon_p4)))
+    """
+    offsets_a, content_a = offsets_and_content(a)
+    offsets_b, content_b = offsets_and_content(b)
+    if len(offsets_a) != len(offsets_b):
+        raise ValueError("Arrays must have the same number of rows.")
+    counts_a = np.diff(offsets_a)
+    counts_b = np.diff(offsets_b)
+
+    npairs = counts_a * counts_b
+    pair_offsets = _counts_to_offsets(npairs)
+
+    # within a row, pair k is (k // counts_b, k % counts_b)
+    k = _local_index(pair_offsets)
+    counts_b = np.repeat(counts_b, npairs)
+    index_a = np.repeat(offsets_a[:-1], npairs) + k // counts_b
+    index_b = np.repeat(offsets_b[:-1], npairs) + k % counts_b
+
+    return (
+        _gather_jagged(pair_offsets, index_a, content_a),
+        _gather_jagged(pair_offsets, index_b, content_b),
+    )
+
+
+# functions made available to `df.draw` expressions
+functions = dict(combinations=combinations, cartesian=cartesian)
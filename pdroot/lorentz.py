@@ -0,0 +1,154 @@
+import numpy as np
+import awkward1
+
+# awkward1 behaviors for records with fields pt/eta/phi/mass and name "LorentzVector".
+# Arrays made with `from_ptetaphim` carry this behavior, so they get the properties below,
+# support `a + b`, and keep working through indexing, masking and `ak.combinations`.
+behavior = dict()
+
+COMPONENTS = ["pt", "eta", "phi", "mass"]
+
+
+def from_ptetaphim(pt, eta, phi, mass):
+    """
+    Zips (possibly jagged) pt, eta, phi, mass arrays into an array of Lorentz vectors
+
+    >>> v = from_ptetaphim(df["Jet_pt"].ak(), df["Jet_eta"].ak(), df["Jet_phi"].ak(), df["Jet_mass"].ak())
+    >>> (v[:, 0] + v[:, 1]).mass
+    """
+    return awkward1.zip(
+        dict(pt=pt, eta=eta, phi=phi, mass=mass),
+        with_name="LorentzVector",
+        behavior=behavior,
+    )
+
+
+def p4_columns(name):
+    """
+    If `name` refers to a Lorentz vector (e.g., "Jet_p4"), returns the
+    list of columns needed to build it (["Jet_pt", "Jet_eta", "Jet_phi", "Jet_mass"]),
+    otherwise returns `None`.
+    """
+    if not name.endswith("_p4"):
+        return None
+    prefix = name[: -len("_p4")]
+    return [f"{prefix}_{x}" for x in COMPONENTS]
+
+
+def _to_cartesian(v):
+    pt, eta, phi, mass = v["pt"], v["eta"], v["phi"], v["mass"]
+    px = pt * np.cos(phi)
+    py = pt * np.sin(phi)
+    pz = pt * np.sinh(eta)
+    energy = np.sqrt(px ** 2 + py ** 2 + pz ** 2 + mass ** 2)
+    return px, py, pz, energy
+
+
+def _from_cartesian(px, py, pz, energy):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pt = np.hypot(px, py)
+        eta = np.arcsinh(pz / pt)
+        phi = np.arctan2(py, px)
+        mass = np.sqrt(np.maximum(energy ** 2 - px ** 2 - py ** 2 - pz ** 2, 0.0))
+    return from_ptetaphim(pt, eta, phi, mass)
+
+
+def _sum_cartesian(vectors):
+    px, py, pz, energy = _to_cartesian(vectors[0])
+    for v in vectors[1:]:
+        px2, py2, pz2, energy2 = _to_cartesian(v)
+        px, py, pz, energy = px + px2, py + py2, pz + pz2, energy + energy2
+    return px, py, pz, energy
+
+
+def add(*vectors):
+    """
+    Sum of one or more Lorentz vectors (elementwise)
+    """
+    return _from_cartesian(*_sum_cartesian(vectors))
+
+
+def mass(*vectors):
+    """
+    Invariant mass of the sum of one or more Lorentz vectors (elementwise)
+
+    >>> mass(Muon_p4[0], Muon_p4[1])
+    >>> mass(Jet_p4[0] + Jet_p4[1])
+    """
+    if len(vectors) == 1:
+        return vectors[0]["mass"]
+    px, py, pz, energy = _sum_cartesian(vectors)
+    return np.sqrt(np.maximum(energy ** 2 - px ** 2 - py ** 2 - pz ** 2, 0.0))
+
+
+def p4sum(vectors):
+    """
+    Sum of the Lorentz vectors in each row of a jagged array of Lorentz vectors
+
+    >>> mass(p4sum(Jet_p4[Jet_pt > 30]))
+    """
+    px, py, pz, energy = _to_cartesian(vectors)
+    return _from_cartesian(
+        awkward1.sum(px, axis=-1),
+        awkward1.sum(py, axis=-1),
+        awkward1.sum(pz, axis=-1),
+        awkward1.sum(energy, axis=-1),
+    )
+
+
+def delta_phi(a, b):
+    """
+    Difference in azimuthal angle, wrapped into [-pi, pi)
+    """
+    return (a["phi"] - b["phi"] + np.pi) % (2 * np.pi) - np.pi
+
+
+def delta_r(a, b):
+    """
+    Angular distance sqrt(deta^2 + dphi^2)
+    """
+    return np.sqrt((a["eta"] - b["eta"]) ** 2 + delta_phi(a, b) ** 2)
+
+
+class _LorentzVectorMethods:
+    @property
+    def px(self):
+        return self["pt"] * np.cos(self["phi"])
+
+    @property
+    def py(self):
+        return self["pt"] * np.sin(self["phi"])
+
+    @property
+    def pz(self):
+        return self["pt"] * np.sinh(self["eta"])
+
+    @property
+    def p(self):
+        return self["pt"] * np.cosh(self["eta"])
+
+    @property
+    def energy(self):
+        return np.sqrt(self.p ** 2 + self["mass"] ** 2)
+
+    def delta_phi(self, other):
+        return delta_phi(self, other)
+
+    def delta_r(self, other):
+        return delta_r(self, other)
+
+
+class LorentzVector(_LorentzVectorMethods, awkward1.Record):
+    pass
+
+
+class LorentzVectorArray(_LorentzVectorMethods, awkward1.Array):
+    pass
+
+
+behavior["LorentzVector"] = LorentzVector
+behavior["*", "LorentzVector"] = LorentzVectorArray
+behavior[np.add, "LorentzVector", "LorentzVector"] = add
+
+# functions made available to `df.draw` expressions
+functions = dict(mass=mass, p4sum=p4sum, delta_phi=delta_phi, delta_r=delta_r)
@@ -23,12 +23,16 @@ RESERVED_TOKENS = [
     "in",
 ]
 
+# functions returning a tuple of arrays, rather than one array
+TUPLE_FUNCTIONS = ["combinations", "cartesian"]
 
-def variables_in_expr(expr, exclude=RESERVED_TOKENS, include=[]):
+
+def variables_in_expr(expr, exclude=RESERVED_TOKENS, include=[], aliases=dict()):
     """
     Given a string like "DV_x:DV_y:(lxy < DV_x+1) and (lxy>1)", returns a list of
     ["DV_x", "DV_y", "lxy"]
     (i.e., extracts what seem to be column names)
+    Names in `aliases` are replaced by the variables in their expressions.
     """
 
     varnames = []
@@ -46,17 +50,51 @@ def variables_in_expr(expr, exclude=RESERVED_TOKENS, include=[]):
             continue
         varnames.append(tokval)
     varnames = list(set(varnames))
+    if any(name in aliases for name in varnames):
+        expanded = []
+        for name in varnames:
+            if name in aliases:
+                # drop the alias itself to avoid infinite recursion
+                others = {k: v for k, v in aliases.items() if k != name}
+                expanded.extend(
+                    variables_in_expr(aliases[name], exclude, include, others)
+                )
+            else:
+                expanded.append(name)
+        varnames = list(set(expanded))
     return varnames
 
 
+def _constant_int(node):
+    """
+    Value of `node` if it is an integer literal (possibly negative), otherwise `None`
+    """
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        sign, node = -1, node.operand
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return sign * node.value
+    return None
+
+
+def _is_str(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _is_number(node):
+    if isinstance(node, ast.UnaryOp):
+        node = node.operand
+    return isinstance(node, ast.Constant) and not isinstance(node.value, str)
+
+
 class Transformer(ast.NodeTransformer):
-    def __init__(self, aliases=dict()):
-        self.aliases = aliases
+    def __init__(self, aliases=None):
+        self.aliases = aliases or dict()
         self.nreducers = 0
 
     def visit_Name(self, node):
         if node.id in self.aliases:
-            node = self.visit(ast.parse(self.aliases[node.id]))
+            node = self.visit(ast.parse(self.aliases[node.id], mode="eval").body)
             return node
         self.generic_visit(node)
         return node
@@ -76,16 +114,27 @@ class Transformer(ast.NodeTransformer):
         self.generic_visit(node)
         return ast.Invert()
 
-    # "a in [1, 2]" -> "np.isin(a, [1, 2])
+    # "a in [1, 2]" -> "categorical.isin(a, [1, 2])" (`np.isin` unless `a` is categorical)
+    # "a == 'foo'" -> "categorical.equal(a, 'foo')"
+    # "a == b" -> "categorical.equal(a, b)" (columns of strings may have different categories)
     # "a < b < c" -> "(a < b) and (b < c)"
     def visit_Compare(self, node):
         if len(node.ops) == 1:
-            if isinstance(node.ops[0], ast.In):
+            op, left, right = node.ops[0], node.left, node.comparators[0]
+            if _is_str(left) and isinstance(op, (ast.Eq, ast.NotEq)):
+                left, right = right, left
+            if isinstance(op, (ast.In, ast.NotIn)):
+                node = ast.Call(
+                    func=ast.Name("categorical.isin"), args=[left, right], keywords=[]
+                )
+            elif isinstance(op, (ast.Eq, ast.NotEq)) and not (
+                _is_number(left) or _is_number(right)
+            ):
                 node = ast.Call(
-                    func=ast.Name("np.isin"),
-                    args=[node.left, node.comparators[0]],
-                    keywords=[],
+                    func=ast.Name("categorical.equal"), args=[left, right], keywords=[]
                 )
+            if isinstance(op, (ast.NotIn, ast.NotEq)) and isinstance(node, ast.Call):
+                node = ast.UnaryOp(op=ast.Invert(), operand=node)
         elif len(node.ops) >= 2:
             # from pandas/core/computation/expr.py
             left = node.left
@@ -134,54 +183,40 @@ class Transformer(ast.NodeTransformer):
         self.generic_visit(node)
         return node
 
-    # "x[2]" -> "ak.pad_none(x, 3, clip=True)[:, 2]"
+    # "x[2]" -> "jagged.index(x, 2)", "x[1:3]" -> "x[:, 1:3]"
+    # "combinations(x, 2)[0]" is left alone (first element of the tuple of pairs)
     def visit_Subscript(self, node):
-        valid_slice = False
+        if isinstance(node.value, ast.Call) and (
+            getattr(node.value.func, "id", None) in TUPLE_FUNCTIONS
+        ):
+            self.generic_visit(node)
+            return node
+
         s = node.slice
+        if isinstance(s, ast.Index):  # python<3.9 wraps the index
+            s = s.value
 
-        # if the slice is a negative number, then convert it into a simpler form
-        # so that it can be subsequently parsed the same way as positive numbers
-        if hasattr(s, "value") and isinstance(s.value, ast.UnaryOp):
-            if isinstance(s.value.op, ast.USub) and isinstance(
-                s.value.operand, ast.Num
-            ):
-                n = -s.value.operand.n
-                if n != -1:
-                    raise Exception(
-                        f"Negative index `{n}` not supported. "
-                        "Only -1 supported, due to ak.pad_none() padding the end of an array."
-                    )
-                s = ast.Index(value=ast.Num(n))
-
-        for attr in ["value", "upper", "lower", "step"]:
-            if isinstance(getattr(s, attr, None), (ast.Constant, ast.Num)):
-                valid_slice = True
-        if valid_slice:
-            if hasattr(s, "value"):
-                upper = s.value.n
-                dimslice = ast.Constant(upper)
-                self.nreducers += 1
-            elif hasattr(s, "upper"):
-                upper = s.upper.n
-                dimslice = s
-            else:
-                raise Exception(f"Slice node not supported: {s}")
-            absupper = abs(upper)
-            if upper >= 0:
-                clip = True
-                absupper = ast.Constant(absupper + 1)
-            else:
-                clip = False
-                absupper = ast.Constant(absupper)
-            value = ast.Call(
-                func=ast.Name("ak.pad_none"),
-                args=[node.value, absupper],
-                keywords=[ast.keyword("clip", ast.Constant(clip))],
+        index = _constant_int(s)
+        if index is not None:
+            # `x[i]` -> ith element of each row, or None if the row is too short
+            node = ast.Call(
+                func=ast.Name("jagged.index"),
+                args=[node.value, ast.Constant(index)],
+                keywords=[],
             )
+            self.nreducers += 1
+        elif isinstance(s, ast.Slice) and all(
+            (getattr(s, attr) is None) or (_constant_int(getattr(s, attr)) is not None)
+            for attr in ["lower", "upper", "step"]
+        ):
+            # `x[a:b]` -> slice within each row
             node = ast.Subscript(
-                value=value,
+                value=node.value,
                 slice=ast.ExtSlice(
-                    dims=[ast.Slice(lower=None, upper=None, step=None), dimslice,]
+                    dims=[
+                        ast.Slice(lower=None, upper=None, step=None),
+                        s,
+                    ]
                 ),
                 ctx=ast.Load(),
             )
@@ -197,14 +232,16 @@ class Transformer(ast.NodeTransformer):
         return node
 
 
-def to_ak_expr(expr, aliases=dict(), transformer=Transformer()):
+def to_ak_expr(expr, aliases=None, transformer=None):
     """
-    turns 
+    turns
         expr = "sum(Jet_pt[abs(Jet_eta)>4.])"
-    into 
+    into
         expr = "ak.sum(Jet_pt[abs(Jet_eta) > 4.0], axis=-1)"
     """
-    transformer.aliases = aliases
+    # a new transformer per call, since draws with different aliases can run in threads
+    if transformer is None:
+        transformer = Transformer(aliases or dict())
     parsed = ast.parse(expr)
     transformer.visit(parsed)
     source = astor.to_source(parsed).strip()
@@ -234,3 +271,61 @@ def split_expr_on_free_colon(expr):
         elif (c == ":") and (n_enclosure == 0):
             return expr[:ic], expr[ic + 1 :]
     return [expr]
+
+
+_FLIPPED_OPS = {">": "<", ">=": "<=", "<": ">", "<=": ">=", "==": "==", "!=": "!="}
+_OP_SYMBOLS = {
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+}
+
+
+def _constant_number(node):
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        sign = -1 if isinstance(node.op, ast.USub) else 1
+        node = node.operand
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return sign * node.value
+    return None
+
+
+def range_predicates(expr):
+    """
+    Extracts comparisons between a column and a number which must all be true for
+    a row to pass the selection `expr` (i.e., those joined by a top-level `and`/`&`),
+    as a list of (column, operator, value).
+
+    >>> range_predicates("MET_pt > 300 and (run == 325000) and 0 < abs(x) < 1 and 2 <= y < 3")
+    [('MET_pt', '>', 300), ('run', '==', 325000), ('y', '>=', 2), ('y', '<', 3)]
+    """
+    if not expr.strip():
+        return []
+
+    def conjuncts(node):
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            return [x for value in node.values for x in conjuncts(value)]
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitAnd):
+            return conjuncts(node.left) + conjuncts(node.right)
+        return [node]
+
+    predicates = []
+    for node in conjuncts(ast.parse(expr, mode="eval").body):
+        if not isinstance(node, ast.Compare):
+            continue
+        operands = [node.left] + node.comparators
+        for left, op, right in zip(operands[:-1], node.ops, operands[1:]):
+            symbol = _OP_SYMBOLS.get(type(op))
+            if symbol is None:
+                continue
+            if isinstance(left, ast.Name) and (_constant_number(right) is not None):
+                predicates.append((left.id, symbol, _constant_number(right)))
+            elif isinstance(right, ast.Name) and (_constant_number(left) is not None):
+                predicates.append(
+                    (right.id, _FLIPPED_OPS[symbol], _constant_number(left))
+                )
+    return predicates
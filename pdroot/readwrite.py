@@ -5,55 +5,99 @@ import numpy as np
 import pandas as pd
 from tqdm.auto import tqdm
 
+import pyarrow
+import pyarrow.parquet
+import pyarrow.ipc
 import uproot4
 import awkward1
 
-warnings.simplefilter("ignore", category=FutureWarning)
-import uproot3
-import awkward0
+warnings.filterwarnings("ignore", message="numpy.ufunc size changed")
 
-warnings.resetwarnings()
 
-warnings.filterwarnings("ignore", message="numpy.ufunc size changed")
+def legacy_modules():
+    """
+    Returns the (uproot3, awkward0) modules, which are only needed for writing
+    ROOT files and `.ak(version=0)`, so they're imported on first use
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=FutureWarning)
+        import uproot3
+        import awkward0
+    return uproot3, awkward0
+
+
+def is_jagged_dtype(dtype):
+    """
+    Whether a pandas dtype is an Arrow-backed list type (i.e., a jagged column)
+    """
+    return isinstance(dtype, pd.ArrowDtype) and (
+        pyarrow.types.is_list(dtype.pyarrow_dtype)
+        or pyarrow.types.is_large_list(dtype.pyarrow_dtype)
+    )
+
+
+def arrow_array_from_values(values):
+    """
+    Returns the contiguous `pyarrow.Array` underlying an Arrow-backed pandas
+    ExtensionArray, only concatenating if the column is split into several chunks
+    (e.g., after `pd.concat`).
+    """
+    chunked = values.__arrow_array__()
+    if chunked.num_chunks == 1:
+        return chunked.chunk(0)
+    if chunked.num_chunks == 0:
+        return pyarrow.array([], type=chunked.type)
+    return pyarrow.concat_arrays(chunked.chunks)
 
 
-def array_to_fletcher_or_numpy(array):
-    import fletcher
+def array_to_arrow_or_numpy(array):
+    """
+    Converts an awkward1 array into something that can be a pandas column:
+    a numpy array for flat numerical arrays, or a pandas `ArrowExtensionArray`
+    (zero-copy view of the awkward buffers) for jagged arrays or arrays with missing values.
+    """
+    layout = array.layout
+    if isinstance(layout, awkward1.layout.NumpyArray) and (array.ndim == 1):
+        return np.asarray(layout)
 
     arrow_array = awkward1.to_arrow(array)
-    fletcher_array = fletcher.FletcherContinuousArray(arrow_array)
-    if (array.ndim >= 2) or (fletcher_array.data.null_count > 0):
-        return fletcher_array
-    if "list<" not in str(fletcher_array.dtype):
-        a = array.layout
+    if (array.ndim >= 2) or (arrow_array.null_count > 0):
+        return pd.arrays.ArrowExtensionArray(arrow_array)
+    if pyarrow.types.is_primitive(arrow_array.type):
+        a = layout
         if hasattr(a, "content"):
             a = a.content
         return np.array(a, copy=False)
-    return fletcher_array
+    return pd.arrays.ArrowExtensionArray(arrow_array)
+
+
+# backwards compatible name from when jagged columns were fletcher arrays
+array_to_fletcher_or_numpy = array_to_arrow_or_numpy
 
 
 def awkward1_arrays_to_dataframe(arrays):
     fields = awkward1.fields(arrays)
     fields = filter(lambda x: not x.endswith("_varn"), fields)
     df = pd.DataFrame(
-        {name: array_to_fletcher_or_numpy(arrays[name]) for name in fields}, copy=False,
+        {name: array_to_arrow_or_numpy(arrays[name]) for name in fields}, copy=False,
     )
     return df
 
 def to_pandas(obj):
     fields = awkward1.fields(obj)
     if len(fields) == 0:
-        return pd.Series(array_to_fletcher_or_numpy(obj), copy=False)
+        return pd.Series(array_to_arrow_or_numpy(obj), copy=False)
     else:
         return awkward1_arrays_to_dataframe(obj)
 
 def maybe_unmask_jagged_array(array):
     """
-    Going through Fletcher/parquet can make JaggedArrays
+    Going through arrow/parquet can make JaggedArrays
     end up as BitMaskedArray (even though there are no NaN),
     so if the mask is dummy, return a regular JaggedArray
     """
-    if not "BitMaskedArray" in str(type(array)):
+    _, awkward0 = legacy_modules()
+    if not isinstance(array, awkward0.BitMaskedArray):
         return array
 
     mask = array.mask
@@ -83,17 +127,34 @@ def read_root(
     entry_start=None,
     entry_stop=None,
     nthreads=4,
+    prune=None,
 ):
     """
     Read ROOT file containing one TTree into pandas DataFrame.
     See documentation for `uproot4.open` and `uproot4.arrays`.
 
-    filename: filename/file pattern
+    filename: filename/file pattern, or a list of them (which may have a ":treename" suffix,
+        as for `iter_draw`). Several files are read concurrently by `nthreads` threads, and
+        put together in one DataFrame without concatenating DataFrames (see `_read_root_files`).
     treename: name of input TTree. If `None`, defaults to the only tree in a file, otherwise prefers `Events`.
     columns: list of columns ("branches") to read (default of `None` reads all)
     entry_start: start entry index (default of `None` means start of file)
     entry_stop: stop entry index (default of `None` means end of file)
+    prune: selection string (e.g., "MET_pt > 300 and run == 325000"). If the file has a statistics index
+        (see `pdroot.stats.build_stats_index`), entry ranges which can't contain rows passing the
+        selection are not read. The selection itself is not applied to the rows that are read.
+
+    >>> df = read_root("nano_*.root", columns=["MET_pt", "Jet_pt"], nthreads=8)
     """
+    from .cache import expand_path
+
+    paths = expand_path(filename, treename)
+    if len(paths) != 1:
+        return _read_root_files(
+            paths, columns, entry_start, entry_stop, nthreads, prune
+        )
+    filename, treename = paths[0]
+
     f = uproot4.open(filename)
     if treename is None:
         treename = find_tree_name(f)
@@ -109,6 +170,24 @@ def read_root(
         executor = concurrent.futures.ThreadPoolExecutor(nthreads)
 
     t = f[treename]
+    if prune:
+        from .stats import load_stats, candidate_ranges
+
+        stats = load_stats(filename, treename)
+        if stats is not None:
+            entry_start = entry_start or 0
+            entry_stop = t.num_entries if entry_stop is None else entry_stop
+            dfs = []
+            for start, stop in candidate_ranges(stats, prune):
+                start, stop = max(start, entry_start), min(stop, entry_stop)
+                if start < stop:
+                    dfs.append(
+                        read_root(filename, treename, columns, start, stop, nthreads)
+                    )
+            if dfs:
+                return pd.concat(dfs, ignore_index=True)
+            entry_stop = entry_start
+
     arrays = t.arrays(
         filter_name=columns,
         entry_start=entry_start,
@@ -120,13 +199,140 @@ def read_root(
     return df
 
 
+def _concatenate_lists(arrays):
+    """
+    Concatenates `pyarrow.ListArray`s of numbers without missing values by writing their
+    contents and (shifted) offsets into arrays allocated with the total sizes
+    """
+    values_type = arrays[0].type.value_type
+    flats = [a.flatten() for a in arrays]
+    if (
+        not pyarrow.types.is_primitive(values_type)
+        or pyarrow.types.is_boolean(values_type)
+        or any(a.null_count or x.null_count for a, x in zip(arrays, flats))
+    ):
+        return pyarrow.concat_arrays(arrays)
+    nvalues = sum(len(x) for x in flats)
+    large = pyarrow.types.is_large_list(arrays[0].type) or (nvalues >= 2 ** 31)
+    offsets = np.empty(sum(len(a) for a in arrays) + 1, np.int64 if large else np.int32)
+    values = np.empty(nvalues, values_type.to_pandas_dtype())
+    offsets[0] = 0
+    row, pos = 0, 0
+    for a, flat in zip(arrays, flats):
+        values[pos : pos + len(flat)] = flat.to_numpy()
+        # offsets of a sliced array don't start at 0
+        local = np.asarray(a.offsets)
+        offsets[row + 1 : row + len(a) + 1] = local[1:] - local[0] + pos
+        row += len(a)
+        pos += len(flat)
+    cls = pyarrow.LargeListArray if large else pyarrow.ListArray
+    return cls.from_arrays(pyarrow.array(offsets), pyarrow.array(values))
+
+
+def _concatenate_values(pieces):
+    """
+    Concatenates the values of a column from several DataFrames
+    """
+    if all(isinstance(x, np.ndarray) and not x.dtype.hasobject for x in pieces):
+        return np.concatenate(pieces)
+    if all(isinstance(x, pd.Categorical) for x in pieces):
+        return pd.api.types.union_categoricals(pieces)
+    if all(is_jagged_dtype(x.dtype) for x in pieces):
+        arrays = [arrow_array_from_values(x) for x in pieces]
+        return pd.arrays.ArrowExtensionArray(_concatenate_lists(arrays))
+    return pd.concat([pd.Series(x) for x in pieces], ignore_index=True).values
+
+
+def _read_root_files(paths, columns, entry_start, entry_stop, nthreads, prune):
+    """
+    Reads the (filename, treename) `paths` (with the entries from `entry_start` to `entry_stop`
+    counted over all of them) concurrently into one DataFrame. Flat columns are written into arrays
+    allocated for all the entries as soon as each file is read. The other columns (e.g., jagged ones)
+    are put together column by column once all files are read, so that their total sizes are known
+    (a jagged column gets single offsets and contents buffers, rather than being a chunked column
+    copied again on use as after `pd.concat`).
+    """
+
+    def count(path):
+        fname, tname = path
+        with uproot4.open(fname) as f:
+            tname = tname or find_tree_name(f)
+            if tname is None:
+                raise RuntimeError(
+                    f"`treename` must be specified. File contains keys: {f.keys()}"
+                )
+            return fname, tname, f[tname].num_entries
+
+    def read(item):
+        fname, tname, start, stop = item
+        return read_root(fname, tname, columns, start, stop, nthreads=1, prune=prune)
+
+    flat = dict()
+    names = []
+    with concurrent.futures.ThreadPoolExecutor(max(nthreads, 1)) as executor:
+        # (the files are opened concurrently to count their entries, as reading them needs
+        # the entries of the previous ones)
+        ranges = []
+        total = 0
+        for fname, tname, num_entries in executor.map(count, paths):
+            start = min(max((entry_start or 0) - total, 0), num_entries)
+            stop = num_entries if entry_stop is None else entry_stop - total
+            stop = min(max(stop, start), num_entries)
+            ranges.append((fname, tname, start, stop))
+            total += num_entries
+        # with `prune`, the number of entries read from each file isn't known in advance
+        bounds = None
+        if not prune:
+            bounds = np.cumsum([0] + [stop - start for _, _, start, stop in ranges])
+
+        pieces = [None] * len(ranges)
+        futures = {executor.submit(read, item): i for i, item in enumerate(ranges)}
+        for future in concurrent.futures.as_completed(futures):
+            # (not keeping a reference to the future, so that `df` is freed once it's copied)
+            i = futures.pop(future)
+            df = future.result()
+            if i == 0:
+                names = list(df.columns)
+            pieces[i] = dict()
+            for name in df.columns:
+                values = df[name].values
+                if (bounds is None) or not (
+                    isinstance(values, np.ndarray) and not values.dtype.hasobject
+                ):
+                    pieces[i][name] = values
+                    continue
+                if name not in flat:
+                    flat[name] = np.empty(bounds[-1], values.dtype)
+                elif not np.can_cast(values.dtype, flat[name].dtype):
+                    flat[name] = flat[name].astype(
+                        np.result_type(values.dtype, flat[name].dtype)
+                    )
+                flat[name][bounds[i] : bounds[i + 1]] = values
+            del df
+    out = dict()
+    for name in names:
+        if name in flat:
+            out[name] = flat.pop(name)
+        else:
+            out[name] = _concatenate_values([p.pop(name) for p in pieces])
+    return pd.DataFrame(out, copy=False)
+
+
+def _uproot3_compression(compression):
+    if not isinstance(compression, str):
+        return compression
+    uproot3, _ = legacy_modules()
+    algorithms = dict(lz4=uproot3.LZ4, zlib=uproot3.ZLIB, lzma=uproot3.LZMA)
+    return algorithms[compression.lower()](1)
+
+
 def to_root(
     df,
     filename,
     treename="t",
     chunksize=20e3,
-    compression=uproot3.ZLIB(1),
-    compression_jagged=uproot3.ZLIB(1),
+    compression="zlib",
+    compression_jagged="zlib",
     progress=False,
 ):
     """
@@ -135,19 +341,28 @@ def to_root(
     filename: name of output file
     treename: name of output TTree
     chunksize: number of rows per basket
-    compression: uproot compression object (LZ4, ZLIB, LZMA, or None)
+    compression: uproot3 compression object (LZ4, ZLIB, LZMA, or None),
+        or the name of one ("lz4", "zlib", "lzma") for level 1
     progress: show tqdm progress bar?
+
+    Lazily-defined columns (see `pdroot.draw.define`) are evaluated chunk by chunk and written out.
     """
+    from .draw import materialize_defines
+
+    uproot3, _ = legacy_modules()
+    compression = _uproot3_compression(compression)
+    compression_jagged = _uproot3_compression(compression_jagged)
+
     tree_dtypes = dict()
     jagged_branches = []
-    for bname, dtype in df.dtypes.items():
-        if "fletcher" in str(dtype):
-            dtype = np.dtype(dtype.arrow_dtype.value_type.to_pandas_dtype())
+    for bname, dtype in materialize_defines(df.iloc[:1]).dtypes.items():
+        if is_jagged_dtype(dtype):
+            dtype = np.dtype(dtype.pyarrow_dtype.value_type.to_pandas_dtype())
             tree_dtypes[bname] = uproot3.newbranch(
                 dtype, size=bname + "_varn", compression=compression_jagged
             )
             jagged_branches.append(bname)
-        elif "object" in str(dtype):
+        elif isinstance(dtype, pd.ArrowDtype) or (dtype == np.dtype("O")):
             raise RuntimeError(
                 f"Don't know how to serialize column {bname} with object dtype."
             )
@@ -162,7 +377,7 @@ def to_root(
         if progress:
             iterable = tqdm(iterable)
         for i in iterable:
-            chunk = df.iloc[i : i + chunksize]
+            chunk = materialize_defines(df.iloc[i : i + chunksize])
             basket = dict()
             for column in chunk.columns:
                 if column in jagged_branches:
@@ -178,16 +393,208 @@ def to_root(
             f[treename].extend(basket)
 
 
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def is_arrow_filename(filename):
+    """
+    Whether `filename` is a Parquet or Arrow IPC (Feather v2) file, based on its extension
+    """
+    return str(filename).lower().endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS)
+
+
+def is_arrow_path(path):
+    """
+    Whether `path` (a filename/pattern, or list of them) refers to Parquet or Arrow IPC files
+    """
+    if isinstance(path, (list, tuple)):
+        return any(map(is_arrow_path, path))
+    return is_arrow_filename(path)
+
+
+def to_arrow(df, filename, chunksize=20e3, compression=None, progress=False):
+    """
+    Writes the input pandas DataFrame to a Parquet or Arrow IPC file,
+    depending on the extension of `filename` (.parquet/.pq or .arrow/.feather/.ipc).
+    Jagged columns are written as Arrow list arrays without conversion.
+
+    chunksize: number of rows per row group (Parquet) or record batch (Arrow IPC)
+    compression: codec name (e.g., "zstd", "lz4", "snappy") or None for the default
+    progress: show tqdm progress bar?
+
+    Lazily-defined columns (see `pdroot.draw.define`) are evaluated chunk by chunk and written out.
+    """
+    from .draw import materialize_defines
+
+    def to_table(chunk):
+        chunk = materialize_defines(chunk)
+        table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+        for i, name in enumerate(chunk.columns):
+            values = chunk[name].values
+            if isinstance(values, np.ndarray) and (values.dtype.kind == "f"):
+                # keep NaN (`from_pandas` turns them into nulls)
+                array = pyarrow.array(values, from_pandas=False)
+                table = table.set_column(i, table.field(i), array)
+        return table
+
+    schema = to_table(df.iloc[:1]).schema
+    if str(filename).lower().endswith(PARQUET_EXTENSIONS):
+        writer = pyarrow.parquet.ParquetWriter(
+            filename, schema, compression=compression or "snappy"
+        )
+        write = writer.write_table
+    else:
+        options = pyarrow.ipc.IpcWriteOptions(compression=compression)
+        writer = pyarrow.ipc.new_file(filename, schema, options=options)
+        write = writer.write_table
+    chunksize = int(chunksize)
+    iterable = range(0, max(len(df), 1), chunksize)
+    if progress:
+        iterable = tqdm(iterable)
+    with writer:
+        for i in iterable:
+            write(to_table(df.iloc[i : i + chunksize]).cast(schema))
+
+
+def arrow_table_to_dataframe(table):
+    """
+    Converts a `pyarrow.Table` into a DataFrame like those from `read_root`: numpy
+    arrays for flat numerical columns, `ArrowExtensionArray`s (sharing the Arrow
+    buffers) for jagged columns, object arrays for strings, and categoricals for
+    dictionary-encoded columns.
+    """
+    columns = dict()
+    for name, column in zip(table.column_names, table.columns):
+        if pyarrow.types.is_primitive(column.type) and (column.null_count == 0):
+            if column.num_chunks == 1:
+                columns[name] = column.chunk(0).to_numpy(zero_copy_only=False)
+            else:
+                columns[name] = column.to_numpy()
+        elif pyarrow.types.is_string(column.type) or pyarrow.types.is_large_string(
+            column.type
+        ):
+            columns[name] = column.to_pandas().values
+        elif pyarrow.types.is_dictionary(column.type):
+            columns[name] = column.to_pandas().values
+        else:
+            columns[name] = pd.arrays.ArrowExtensionArray(column)
+    return pd.DataFrame(columns, copy=False)
+
+
+def arrow_row_groups(filename):
+    """
+    List of (entry_start, entry_stop) of the row groups (Parquet)
+    or record batches (Arrow IPC) in a file
+    """
+    if str(filename).lower().endswith(PARQUET_EXTENSIONS):
+        metadata = pyarrow.parquet.ParquetFile(filename).metadata
+        counts = [
+            metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)
+        ]
+    else:
+        with pyarrow.memory_map(str(filename)) as source:
+            reader = pyarrow.ipc.open_file(source)
+            counts = [
+                reader.get_batch(i).num_rows for i in range(reader.num_record_batches)
+            ]
+    offsets = np.cumsum([0] + counts)
+    return list(zip(offsets[:-1].tolist(), offsets[1:].tolist()))
+
+
+def read_arrow(filename, columns=None, entry_start=None, entry_stop=None):
+    """
+    Read a Parquet or Arrow IPC file into a pandas DataFrame (the format is
+    determined from the extension, as for `to_arrow`). Files are memory-mapped, and
+    only the row groups/record batches overlapping the entry range are read. For Arrow IPC
+    files, jagged columns are zero-copy views of the mapped file.
+
+    filename: filename
+    columns: list of columns to read (default of `None` reads all)
+    entry_start: start entry index (default of `None` means start of file)
+    entry_stop: stop entry index (default of `None` means end of file)
+    """
+    ranges = arrow_row_groups(filename)
+    nentries = ranges[-1][1] if ranges else 0
+    entry_start = 0 if entry_start is None else max(int(entry_start), 0)
+    entry_stop = nentries if entry_stop is None else min(int(entry_stop), nentries)
+    groups = [
+        i
+        for i, (start, stop) in enumerate(ranges)
+        if (start < entry_stop) and (stop > entry_start)
+    ]
+    offset = ranges[groups[0]][0] if groups else 0
+
+    if str(filename).lower().endswith(PARQUET_EXTENSIONS):
+        f = pyarrow.parquet.ParquetFile(filename, memory_map=True)
+        if groups:
+            table = f.read_row_groups(groups, columns=columns)
+        else:
+            table = f.schema_arrow.empty_table()
+            if columns is not None:
+                table = table.select(columns)
+    else:
+        reader = pyarrow.ipc.open_file(pyarrow.memory_map(str(filename)))
+        batches = [reader.get_batch(i) for i in groups]
+        table = pyarrow.Table.from_batches(batches, schema=reader.schema)
+        if columns is not None:
+            table = table.select(columns)
+    table = table.slice(entry_start - offset, max(entry_stop - entry_start, 0))
+    return arrow_table_to_dataframe(table)
+
+
 def iter_chunks(
-    path, treename="t", progress=True, step_size="50MB", columns=None, nthreads=4,
+    path,
+    treename="t",
+    progress=True,
+    step_size="50MB",
+    columns=None,
+    nthreads=4,
+    executor=None,
+    retries=0,
+    on_error="raise",
+    prune=None,
 ):
     """
-    Loop over specified ROOT files in `path` in chunks, returning dataframes.
+    Loop over specified ROOT (or Parquet/Arrow IPC) files in `path` in chunks, returning dataframes.
     Tree name is specified via `treename`.
     Iterates over the files in chunks of `step_size` (as per `uproot4.iterate`), reading
 
     columns: list of columns ("branches") to read (default of `None` reads all)
+    executor: if specified, the files are split into work units that are read by this executor
+        (see `pdroot.executors`, or "threads"/"processes"), and the dataframes are returned in order
+    retries: number of times to retry reading a work unit (a file and entry range) that fails
+    on_error: "raise" or "skip" work units that still fail after the retries
+    prune: selection string used to skip entry ranges that can't contain passing rows, according
+        to the files' statistics (see `pdroot.stats`). The selection itself is not applied.
     """
+    if (
+        (executor is not None)
+        or retries
+        or (on_error != "raise")
+        or is_arrow_path(path)
+        or prune
+    ):
+        from .executors import make_work_units, read_work_unit, run_work_units
+        from .stats import prune_work_units
+
+        # files that can't be opened fail (as per `on_error`) when processed
+        units = make_work_units(path, treename, step_size, columns, on_error="skip")
+        if prune:
+            units = prune_work_units(units, prune)
+        iterable = run_work_units(
+            read_work_unit,
+            units,
+            columns,
+            executor=executor,
+            retries=retries,
+            on_error=on_error,
+        )
+        if progress:
+            iterable = tqdm(iterable, total=len(units))
+        yield from _iter_dataframes(iterable, progress)
+        return
+
     if ":" not in path:
         path = f"{path}:{treename}"
 
@@ -201,10 +608,15 @@ def iter_chunks(
     if progress:
         iterable = tqdm(iterable)
 
+    yield from _iter_dataframes(
+        (awkward1_arrays_to_dataframe(arrays) for arrays in iterable), progress
+    )
+
+
+def _iter_dataframes(iterable, progress):
     nevents = 0
     t0 = time.time()
-    for arrays in iterable:
-        df = awkward1_arrays_to_dataframe(arrays)
+    for df in iterable:
         nevents += len(df)
         yield df
     t1 = time.time()
@@ -245,11 +657,16 @@ class ChunkDataFrame(pd.DataFrame):
             self.tree = uproot4.open(self.filename)[self.treename]
 
     def _add_column(self, column):
-        self._load_tree()
-        array = self.tree[column].array(
-            entry_start=self.entry_start, entry_stop=self.entry_stop
-        )
-        array = array_to_fletcher_or_numpy(array)
+        if is_arrow_filename(self.filename):
+            array = read_arrow(
+                self.filename, [column], self.entry_start, self.entry_stop
+            )[column].values
+        else:
+            self._load_tree()
+            array = self.tree[column].array(
+                entry_start=self.entry_start, entry_stop=self.entry_stop
+            )
+            array = array_to_arrow_or_numpy(array)
 
         # if current index is not the original one,
         # then take the subset of the ttree column with the right indexing
@@ -0,0 +1,287 @@
+import os
+import sys
+import argparse
+import threading
+import traceback
+from multiprocessing import shared_memory, resource_tracker, AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+import pandas as pd
+
+from .readwrite import ChunkDataFrame
+from .cache import expand_path
+from .draw import columns_to_read, get_defines
+from .parse import variables_in_expr
+
+# A server process keeps the columns of a dataset in memory (reading each one the first time a
+# request needs it) and answers draw/adraw/cutflow requests from clients over a socket
+# (a TCP address, or a path for a Unix socket). Histograms and cutflows are small and are pickled
+# over the connection. Numeric arrays are put in a shared memory block instead, which the client
+# copies out of and then unlinks, so large arrays don't go through the socket.
+#
+# Requests are unpickled and evaluate expressions, so anyone who can connect with the authentication
+# key can run code as the server's user. The key is random unless specified, and is shared with
+# clients through a file only readable by its owner. Unix sockets are only accessible by their owner.
+
+
+def _to_shared(result):
+    """
+    `result` with numeric arrays replaced by descriptions of shared memory blocks holding them
+    """
+    if isinstance(result, tuple):
+        return tuple(_to_shared(x) for x in result)
+    if not isinstance(result, np.ndarray) or result.dtype.hasobject:
+        return result
+    result = np.ascontiguousarray(result)
+    shm = shared_memory.SharedMemory(create=True, size=max(result.nbytes, 1))
+    np.ndarray(result.shape, result.dtype, buffer=shm.buf)[...] = result
+    shm.close()
+    # the client unlinks it once it has been copied
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return ("shared_memory", shm.name, result.shape, result.dtype.str)
+
+
+def _from_shared(result):
+    """
+    Inverse of `_to_shared`, releasing the shared memory blocks
+    """
+    if isinstance(result, tuple) and result and (result[0] == "shared_memory"):
+        _, name, shape, dtype = result
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return np.ndarray(shape, dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+    if isinstance(result, tuple):
+        return tuple(_from_shared(x) for x in result)
+    return result
+
+
+def write_authkey(path, authkey):
+    """
+    Writes `authkey` to a file only readable by its owner
+    """
+    path = os.path.expanduser(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        os.fchmod(fh.fileno(), 0o600)
+        fh.write(authkey)
+
+
+def read_authkey(path):
+    """
+    Reads an authentication key written by `write_authkey`
+    """
+    with open(os.path.expanduser(path), "rb") as fh:
+        return fh.read().strip()
+
+
+def _listen(address, authkey):
+    if isinstance(address, str):
+        # a Unix socket only accessible by its owner
+        umask = os.umask(0o177)
+        try:
+            return Listener(address, authkey=authkey)
+        finally:
+            os.umask(umask)
+    return Listener(address, authkey=authkey)
+
+
+def _concatenate(results):
+    """
+    Concatenates (possibly nested tuples of) arrays from `df.adraw`
+    """
+    if isinstance(results[0], tuple):
+        return tuple(_concatenate(list(x)) for x in zip(*results))
+    return np.concatenate(results)
+
+
+class DrawServer:
+    """
+    Keeps a dataset in memory and answers `draw`, `adraw`, and `cutflow` requests from
+    `DrawClient`s, so that several processes (e.g., notebooks on the same node)
+    share one copy of the data. `source` is a DataFrame, or files as for `iter_draw` (a path with a glob,
+    or a list), whose columns are read the first time a request needs them and then kept.
+    `address` is a (host, port) pair or the path of a Unix socket. Clients need the `authkey`
+    (random if not specified, in `server.authkey`), which can be passed on in a private file
+    (see `write_authkey`).
+
+    >>> server = DrawServer("/data/nano_*.root", treename="Events", address="/tmp/pdroot.sock")
+    >>> write_authkey("~/.pdroot.key", server.authkey)
+    >>> server.serve_forever()
+    or, from a shell
+        python -m pdroot.server "/data/nano_*.root" --treename Events --address /tmp/pdroot.sock \\
+            --authkey-file ~/.pdroot.key
+    """
+
+    def __init__(self, source, treename="t", address=("localhost", 0), authkey=None):
+        if isinstance(source, pd.DataFrame):
+            self.frames = [source]
+        else:
+            self.frames = [
+                ChunkDataFrame(filename=fname, treename=tname)
+                for fname, tname in expand_path(source, treename)
+            ]
+        if authkey is None:
+            authkey = os.urandom(32).hex().encode()
+        self.authkey = authkey
+        self._listener = _listen(address, authkey)
+        self.address = self._listener.address
+        # requests are handled one at a time, since reading columns modifies the frames
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _read_columns(self, exprs, defines):
+        """
+        Reads the branches needed by `exprs` (joined by "$") that aren't in memory yet
+        """
+        for df in self.frames:
+            if isinstance(df, ChunkDataFrame):
+                colnames = variables_in_expr(exprs, aliases=get_defines(df, defines))
+                df._possibly_cache(columns_to_read(colnames))
+
+    def draw(self, varexp, sel="", weights="", to_array=False, **kwargs):
+        exprs = list(weights.values()) if isinstance(weights, dict) else [weights]
+        exprs = [varexp, sel] + exprs + [kwargs.get("by") or ""]
+        self._read_columns("$".join(exprs), kwargs.get("defines"))
+        if kwargs.get("bins", "") is None:
+            kwargs.pop("bins")
+        if len(self.frames) == 1:
+            return self.frames[0].draw(varexp, sel, weights, to_array, **kwargs)
+        results = []
+        for df in self.frames:
+            results.append(df.draw(varexp, sel, weights, to_array, **kwargs))
+            if not to_array and ("bins" not in kwargs):
+                # so that the histograms of the files can be added
+                kwargs["bins"] = results[0].edges
+        return _concatenate(results) if to_array else sum(results)
+
+    def adraw(self, *args, **kwargs):
+        return self.draw(*args, **dict(kwargs, to_array=True))
+
+    def cutflow(self, cuts, weights="", **kwargs):
+        self._read_columns("$".join(list(cuts) + [weights]), kwargs.get("defines"))
+        return sum(df.cutflow(cuts, weights, **kwargs) for df in self.frames)
+
+    def _handle(self, conn):
+        methods = dict(draw=self.draw, adraw=self.adraw, cutflow=self.cutflow)
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                if request is None:
+                    break
+                method, args, kwargs = request
+                try:
+                    with self._lock:
+                        result = methods[method](*args, **kwargs)
+                    conn.send((True, _to_shared(result)))
+                except Exception:
+                    conn.send((False, traceback.format_exc()))
+
+    def serve_forever(self):
+        """
+        Accepts clients (each served in a thread) until `close` is called
+        """
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                # (a client without the key)
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        """
+        Serves in a background thread (e.g., from a notebook)
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DrawClient:
+    """
+    Connection to a `DrawServer`, with `draw`, `adraw`, and `cutflow` methods which take the
+    same arguments as `df.draw`, `df.adraw`, and `df.cutflow`
+
+    >>> client = DrawClient("/tmp/pdroot.sock", read_authkey("~/.pdroot.key"))
+    >>> client.draw("MET_pt", "nJet >= 2", bins="50,0,500")
+    >>> client.adraw("Jet_pt[0]", "MET_pt > 100")
+    """
+
+    def __init__(self, address, authkey):
+        self._conn = Client(address, authkey=authkey)
+
+    def _request(self, method, *args, **kwargs):
+        self._conn.send((method, args, kwargs))
+        ok, result = self._conn.recv()
+        if not ok:
+            raise RuntimeError(f"Request failed on the server:\n{result}")
+        return _from_shared(result)
+
+    def draw(self, *args, **kwargs):
+        return self._request("draw", *args, **kwargs)
+
+    def adraw(self, *args, **kwargs):
+        return self._request("adraw", *args, **kwargs)
+
+    def cutflow(self, *args, **kwargs):
+        return self._request("cutflow", *args, **kwargs)
+
+    def close(self):
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Runs a DrawServer keeping the columns of a dataset in memory"
+    )
+    parser.add_argument("path", nargs="+", help="files (may contain globs)")
+    parser.add_argument("--treename", default="Events", help="name of the tree")
+    parser.add_argument(
+        "--address", required=True, help="host:port, or path of a Unix socket"
+    )
+    parser.add_argument(
+        "--authkey-file",
+        required=True,
+        help="file to which a random authentication key is written (readable only by its owner)",
+    )
+    args = parser.parse_args(args)
+    address = args.address
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+    server = DrawServer(args.path, args.treename, address)
+    write_authkey(args.authkey_file, server.authkey)
+    print(f"Serving on {server.address} with the key in {args.authkey_file}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
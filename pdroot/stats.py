@@ -0,0 +1,182 @@
+import os
+import json
+
+import numpy as np
+import pyarrow.parquet
+import uproot4
+import awkward1
+
+from .readwrite import is_arrow_filename, PARQUET_EXTENSIONS
+from .cache import expand_path, file_fingerprint
+from .parse import range_predicates
+
+# Per-entry-range min/max statistics of columns, used to skip entry ranges that can't pass
+# a selection. For ROOT files, the ranges are the basket boundaries and the statistics are
+# stored in a JSON sidecar file (made with `build_stats_index`). For Parquet files, the
+# row group statistics in the file's metadata are used.
+#
+# A range without any values of a column (e.g., no jets) has min=inf and max=-inf, so
+# that no comparison can be satisfied, and unknown statistics are min=-inf and max=inf
+# (also used for ranges containing NaN, which would pass "!=").
+
+
+def sidecar_filename(filename):
+    return f"{filename}.stats.json"
+
+
+def _range_min_max(array, ranges):
+    """
+    Min and max of a (possibly jagged) awkward1 array within each entry range
+    """
+    if array.ndim > 1:
+        counts = np.asarray(awkward1.num(array, axis=1))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        content = np.asarray(awkward1.flatten(array, axis=None))
+    else:
+        offsets = np.arange(len(array) + 1)
+        content = np.asarray(array)
+    starts = offsets[[start for start, _ in ranges]]
+    stops = offsets[[stop for _, stop in ranges]]
+    mins = np.full(len(ranges), np.inf)
+    maxs = np.full(len(ranges), -np.inf)
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        if stop > start:
+            mins[i] = content[start:stop].min()
+            maxs[i] = content[start:stop].max()
+            if np.isnan(mins[i]) or np.isnan(maxs[i]):
+                mins[i], maxs[i] = -np.inf, np.inf
+    return mins, maxs
+
+
+def build_stats_index(path, columns, treename="t"):
+    """
+    Computes per-basket min/max statistics of `columns` for each ROOT file in `path`
+    and stores them in a sidecar file next to each file ("<filename>.stats.json").
+    They are used by `iter_draw`, `iter_chunks`, and `read_root` with `prune=...`.
+
+    >>> build_stats_index("nano_*.root", ["run", "MET_pt", "Jet_pt"], treename="Events")
+    >>> iter_draw("nano_*.root", "MET_pt", "MET_pt > 300", treename="Events", prune=True)
+    """
+    for fname, tname in expand_path(path, treename):
+        with uproot4.open(fname) as f:
+            tree = f[tname]
+            boundaries = {0, tree.num_entries}
+            for column in columns:
+                boundaries.update(int(x) for x in tree[column].entry_offsets)
+            boundaries = sorted(boundaries)
+            ranges = list(zip(boundaries[:-1], boundaries[1:]))
+            stats = dict()
+            for column in columns:
+                mins, maxs = _range_min_max(tree[column].array(), ranges)
+                stats[column] = dict(min=mins.tolist(), max=maxs.tolist())
+        index = dict(
+            fingerprint=list(file_fingerprint(fname, tname)),
+            ranges=ranges,
+            columns=stats,
+        )
+        with open(sidecar_filename(fname), "w") as fh:
+            json.dump(index, fh)
+
+
+def _parquet_stats(filename):
+    metadata = pyarrow.parquet.ParquetFile(filename).metadata
+    ranges = []
+    stats = dict()
+    start = 0
+    for i in range(metadata.num_row_groups):
+        group = metadata.row_group(i)
+        ranges.append((start, start + group.num_rows))
+        start += group.num_rows
+        for j in range(group.num_columns):
+            chunk = group.column(j)
+            # e.g., "Jet_pt.list.item" for a jagged column
+            name = chunk.path_in_schema.split(".")[0]
+            s = stats.setdefault(name, dict(min=[], max=[]))
+            lo, hi = -np.inf, np.inf
+            st = chunk.statistics
+            if (st is not None) and st.has_min_max:
+                if isinstance(st.min, (int, float)) and not isinstance(st.min, bool):
+                    lo, hi = st.min, st.max
+            s["min"].append(lo)
+            s["max"].append(hi)
+    return dict(ranges=ranges, columns=stats)
+
+
+def load_stats(filename, treename="t"):
+    """
+    Statistics index of a file (a dictionary with "ranges" and per-column
+    "min"/"max" lists), or `None` if not available or out of date.
+    """
+    if str(filename).lower().endswith(PARQUET_EXTENSIONS):
+        return _parquet_stats(filename)
+    if is_arrow_filename(filename) or not os.path.exists(sidecar_filename(filename)):
+        return None
+    with open(sidecar_filename(filename)) as fh:
+        index = json.load(fh)
+    if index["fingerprint"] != list(file_fingerprint(filename, treename)):
+        return None
+    return index
+
+
+def _possible(mins, maxs, op, value):
+    if op == ">":
+        return maxs > value
+    if op == ">=":
+        return maxs >= value
+    if op == "<":
+        return mins < value
+    if op == "<=":
+        return mins <= value
+    if op == "==":
+        return (mins <= value) & (value <= maxs)
+    return ~((mins == value) & (maxs == value))
+
+
+def candidate_ranges(stats, sel, exclude=()):
+    """
+    Entry ranges (merged where contiguous) that may contain rows passing
+    the selection `sel`, according to the statistics index `stats`
+    (ignoring comparisons involving names in `exclude`, e.g., lazily-defined columns)
+    """
+    ranges = np.array(stats["ranges"], dtype=np.int64).reshape(-1, 2)
+    keep = np.ones(len(ranges), dtype=bool)
+    for column, op, value in range_predicates(sel):
+        if (column not in stats["columns"]) or (column in exclude):
+            continue
+        mins = np.array(stats["columns"][column]["min"], dtype=np.float64)
+        maxs = np.array(stats["columns"][column]["max"], dtype=np.float64)
+        keep &= _possible(mins, maxs, op, value)
+    out = []
+    for start, stop in ranges[keep].tolist():
+        if out and out[-1][1] == start:
+            out[-1][1] = stop
+        else:
+            out.append([start, stop])
+    return [tuple(x) for x in out]
+
+
+def prune_work_units(units, sel, exclude=()):
+    """
+    Drops (parts of) work units that can't contain rows passing the selection `sel`
+    (see `candidate_ranges`)
+    """
+    if not range_predicates(sel):
+        return list(units)
+    out = []
+    cached = dict()
+    for unit in units:
+        key = (unit.filename, unit.treename)
+        if key not in cached:
+            stats = load_stats(*key)
+            if stats is not None:
+                stats = candidate_ranges(stats, sel, exclude)
+            cached[key] = stats
+        candidates = cached[key]
+        if (candidates is None) or (unit.entry_stop is None):
+            out.append(unit)
+            continue
+        for start, stop in candidates:
+            start, stop = max(start, unit.entry_start), min(stop, unit.entry_stop)
+            if start < stop:
+                out.append(unit._replace(entry_start=start, entry_stop=stop))
+    return out
@@ -1,5 +1,15 @@
 from pdroot.draw import tree_draw, iter_draw
 from pdroot.readwrite import awkward1_arrays_to_dataframe
+from pdroot.cache import DrawCache
+from pdroot.executors import (
+    WorkUnit,
+    make_work_units,
+    run_work_units,
+    SocketExecutor,
+    run_worker,
+)
+
+import os
 
 import numpy as np
 import pandas as pd
@@ -24,6 +34,8 @@ def df_jagged():
         dict(
             Jet_pt=[[42.0, 15.0, 10.5], [], [11.5], [50.0, 5.0]],
             Jet_eta=[[-2.2, 0.4, 0.5], [], [1.5], [-0.1, -3.0]],
+            Jet_phi=[[0.1, 1.5, -2.0], [], [0.3], [3.0, -3.0]],
+            Jet_mass=[[5.0, 3.0, 2.0], [], [1.0], [4.0, 6.0]],
             MET_pt=[46.5, 30.0, 82.0, 8.9],
             eventWeight=[-1.0, 0.0, 2.0, 2.0],
         )
@@ -104,6 +116,13 @@ cases_noweights = [
     ("Jet_pt[0]:Jet_pt[1]", "", ([42, 50], [15, 5])),
     ("Jet_pt[2]", "", [10.5]),
     ("Jet_pt[-1]", "", [10.5, 11.5, 5.0]),
+    ("Jet_pt[-2]", "", [15, 50]),
+    ("Jet_pt[-3]:Jet_eta[-3]", "", ([42], [-2.2])),
+    ("Jet_pt[-2]", "MET_pt > 40", [15]),
+    ("MET_pt", "Jet_pt[0] > 40", [46.5, 8.9]),
+    ("MET_pt", "Jet_pt[-1] > 10", [46.5, 82]),
+    ("sum(Jet_pt[-2:])", "", [15 + 10.5, 0, 11.5, 50 + 5]),
+    ("sum(Jet_pt[::2])", "", [42 + 10.5, 0, 11.5, 50]),
     ("Jet_pt[Jet_pt>25]", "", [42, 50]),
     ("sum(Jet_pt[abs(Jet_eta)<2.0])", "", [15 + 10.5, 0.0, 11.5, 50.0]),
     ("sum(Jet_pt>10)", "MET_pt>40", [3, 1]),
@@ -148,6 +167,19 @@ cases_noweights = [
         [True, False, False, False],
     ),
     ("MET_pt", "(sr in ['foo','bar']) and MET_pt>10", [46.5, 30],),
+    ("length(combinations(Jet_pt, 2)[0])", "", [3, 0, 0, 1]),
+    ("length(combinations(Jet_pt, 3)[2])", "", [1, 0, 0, 0]),
+    (
+        "sum(combinations(Jet_pt, 2)[0] + combinations(Jet_pt, 2)[1] > 50)",
+        "",
+        [2, 0, 0, 1],
+    ),
+    (
+        "sum(cartesian(Jet_pt, Jet_eta)[0] * cartesian(Jet_pt, Jet_eta)[1])",
+        "",
+        [67.5 * -1.3, 0, 11.5 * 1.5, 55 * -3.1],
+    ),
+    ("min(delta_r(*cartesian(Jet_p4, Jet_p4)))", "MET_pt > 40", [0, 0]),
 ]
 
 
@@ -159,6 +191,29 @@ def test_draw(df_jagged, varexp, sel, expected):
     np.testing.assert_allclose(x, y)
 
 
+@pytest.mark.parametrize("varexp,sel,expected", cases_noweights)
+def test_draw_threads(df_jagged, varexp, sel, expected):
+    x = tree_draw(df_jagged, varexp, sel, to_array=True, nthreads=3)
+    if isinstance(x, tuple):
+        x = np.array(x)
+    np.testing.assert_allclose(x, np.array(expected))
+
+
+def test_draw_chunk_rows(df_flat):
+    df = df_flat
+    varexp, sel = "a+b", "(a<b<c) and (a<0.5)"
+    h1 = df.draw(varexp, sel, bins="10,0,2")
+    h2 = df.draw(varexp, sel, bins="10,0,2", chunk_rows=300)
+    h3 = df.draw(varexp, sel, bins="10,0,2", chunk_rows=300, nthreads=2)
+    np.testing.assert_allclose(h1.counts, h2.counts)
+    np.testing.assert_allclose(h1.counts, h3.counts)
+    np.testing.assert_allclose(h1.errors, h2.errors)
+    np.testing.assert_allclose(
+        df.adraw(varexp, sel), df.adraw(varexp, sel, chunk_rows=300)
+    )
+    np.testing.assert_allclose(df.draw(varexp).counts, df.draw(varexp, chunk_rows=7).counts)
+
+
 cases_weights = [
     (
         "Jet_pt",
@@ -180,6 +235,13 @@ cases_weights = [
     ("Jet_pt[0]:Jet_pt[1]", "", "eventWeight", ([42, 50], [15, 5]), [-1, 2]),
     ("Jet_pt[0]", "MET_pt>40", "length(Jet_pt)", [42.0, 11.5], [3, 1]),
     ("Jet_pt[0]", "", "length(Jet_pt)", [42.0, 11.5, 50], [3, 1, 2]),
+    (
+        "Jet_pt",
+        "",
+        "eventWeight",
+        [42.0, 15.0, 10.5, 11.5, 50.0, 5.0],
+        [-1, -1, -1, 2, 2, 2],
+    ),
 ]
 
 
@@ -193,6 +255,196 @@ def test_draw_weights(df_jagged, varexp, sel, weights, expected, expectedweights
     np.testing.assert_allclose(vweights, vweights_exp)
 
 
+def test_draw_weight_variations(df_jagged, df_flat):
+    weights = dict(nominal="eventWeight", up="eventWeight*2", njets="length(Jet_pt)")
+    for varexp in ["Jet_pt[0]", "Jet_pt[0]:Jet_pt[1]"]:
+        hists = df_jagged.draw(varexp, "MET_pt>10", bins="5,0,100", weights=weights)
+        assert list(hists) == list(weights)
+        for name, weight in weights.items():
+            h = df_jagged.draw(varexp, "MET_pt>10", bins="5,0,100", weights=weight)
+            np.testing.assert_allclose(hists[name].counts, h.counts)
+            np.testing.assert_allclose(hists[name].errors, h.errors)
+            np.testing.assert_allclose(hists[name].edges, h.edges)
+
+    x, vweights = df_jagged.adraw("Jet_pt[0]", "MET_pt>40", weights=weights)
+    np.testing.assert_allclose(vweights["njets"], [3, 1])
+    np.testing.assert_allclose(vweights["up"], [-2, 4])
+
+    weights = dict(w1="a", w2="b*c")
+    hists = df_flat.draw("a+b", weights=weights, chunk_rows=300, bins="10,0,2")
+    total = hists + hists
+    h = df_flat.draw("a+b", weights="b*c", bins="10,0,2")
+    np.testing.assert_allclose(total["w2"].counts, 2 * h.counts)
+    np.testing.assert_allclose(hists.edges, df_flat.draw("a+b", bins="10,0,2").edges)
+
+
+def test_draw_by(df_jagged):
+    df = df_jagged.copy()
+    df["isr"] = [1, 2, 1, 5]
+    df["csr"] = pd.Categorical(df["sr"], categories=["foo", "bar", "baz", "qux"])
+    for varexp in ["Jet_pt", "MET_pt", "Jet_pt[0]:Jet_pt[1]"]:
+        for by in ["sr", "isr", "csr"]:
+            hists = df.draw(varexp, "MET_pt>10", bins="5,0,100", by=by)
+            for key in df[by].unique():
+                h = df[df[by] == key].draw(varexp, "MET_pt>10", bins="5,0,100")
+                np.testing.assert_allclose(hists[key].counts, h.counts)
+    assert list(df.draw("MET_pt", by="csr")) == ["foo", "bar", "baz", "qux"]
+
+    hists = df.draw("Jet_pt", by="sr", weights=dict(w="eventWeight"), bins="5,0,100")
+    np.testing.assert_allclose(hists["foo", "w"].counts, [-2 + 2, 0, -1 + 2, 0, 0])
+    x, labels = df.adraw("Jet_pt", "MET_pt>10", by="sr")
+    assert labels.tolist() == ["foo", "foo", "foo", "baz"]
+
+    h1 = df.draw("Jet_pt", by="isr", bins="5,0,100", chunk_rows=2)
+    h2 = df.draw("Jet_pt", by="isr", bins="5,0,100")
+    for key in h2:
+        np.testing.assert_allclose(h1[key].counts, h2[key].counts)
+
+    df[["MET_pt", "isr"]].to_root(".test.root")
+    hists = iter_draw(
+        ".test.root", "MET_pt", by="isr", bins="5,0,100", step_size=1, progress=False
+    )
+    assert sorted(hists) == [1, 2, 5]
+    np.testing.assert_allclose(hists[1].counts, [0, 0, 1, 0, 1])
+
+
+def test_draw_profile(df_flat, df_jagged, tmp_path):
+    df = df_flat
+    groups = (df["b"] * df["c"]).groupby(np.floor(df["a"] * 5))
+    p = df.draw("a:b*c", bins="5,0,1", profile=True)
+    np.testing.assert_allclose(p.counts, groups.mean())
+    np.testing.assert_allclose(p.errors, groups.std(ddof=0) / np.sqrt(groups.count()))
+    for aggregate in ["std", "sum", "min", "max"]:
+        expected = groups.agg(aggregate, **(dict(ddof=0) if aggregate == "std" else {}))
+        p = df.draw("a:b*c", bins="5,0,1", aggregate=aggregate, chunk_rows=300)
+        np.testing.assert_allclose(p.counts, expected)
+
+    p = df_jagged.draw(
+        "Jet_pt[0]:MET_pt", bins="2,0,100", weights="eventWeight", profile=True
+    )
+    np.testing.assert_allclose(p.counts, [(2 * 82 - 46.5) / 1, 8.9])
+
+    df[["a", "b", "c"]].to_arrow(str(tmp_path / "flat.parquet"))
+    p = iter_draw(
+        str(tmp_path / "flat.parquet"),
+        "a:b*c",
+        bins="5,0,1",
+        aggregate="max",
+        step_size=300,
+        progress=False,
+    )
+    np.testing.assert_allclose(p.counts, groups.max())
+
+
+def test_draw_approx(df_flat, tmp_path):
+    from pdroot.draw import iter_draw_progressive
+
+    df = df_flat
+    h = df.draw("a+b", bins="10,0,2")
+    h1 = df.draw("a+b", bins="10,0,2", approx=0.2)
+    assert h1.metadata["approx"] == 0.2
+    np.testing.assert_allclose(h1.integral, h.integral)
+    assert (np.abs(h1.counts - h.counts) <= 5 * h1.errors + 1e-6).all()
+    assert len(df.adraw("a+b", approx=0.2)) == 200
+    np.testing.assert_allclose(df.draw("a+b", bins="10,0,2", approx=1).counts, h.counts)
+
+    fname = str(tmp_path / "flat.parquet")
+    df.to_arrow(fname, chunksize=100)
+    hists = list(
+        iter_draw_progressive(fname, "a+b", fractions=[0.1, 0.5, 1], step_size=100)
+    )
+    assert [x.metadata["approx"] for x in hists] == [0.1, 0.5, 1.0]
+    np.testing.assert_allclose([x.integral for x in hists], h.integral)
+    np.testing.assert_allclose(
+        hists[-1].counts, df.draw("a+b", bins=hists[0].edges).counts
+    )
+    h2 = iter_draw(fname, "a+b", bins="10,0,2", approx=0.3, progress=False)
+    assert h2.metadata["approx"] == 0.3
+    np.testing.assert_allclose(h2.integral, h.integral)
+
+    # branches of a ChunkDataFrame are read before splitting its rows
+    from pdroot.readwrite import ChunkDataFrame
+
+    fname = str(tmp_path / "flat.root")
+    df.to_root(fname, treename="t")
+    for opts in [dict(approx=0.2), dict(chunk_rows=300), dict(nthreads=3)]:
+        h3 = ChunkDataFrame(filename=fname, treename="t").draw(
+            "a+b", bins="10,0,2", **opts
+        )
+        np.testing.assert_allclose(h3.integral, h.integral)
+
+
+def test_draw_strings(df_jagged):
+    df = df_jagged.copy()
+    df["csr"] = df["sr"].astype("category")
+    for column in ["sr", "csr"]:
+        for sel, expected in [
+            (f"{column} == 'foo'", [46.5, 8.9]),
+            (f"'foo' == {column}", [46.5, 8.9]),
+            (f"{column} != 'foo' and MET_pt > 40", [82]),
+            (f"{column} == 'qux'", []),
+            (f"{column} in ['bar', 'baz', 'qux']", [30, 82]),
+            (f"{column} not in ['bar', 'baz']", [46.5, 8.9]),
+            (f"({column} == 'foo') and length(Jet_pt) > 2", [46.5]),
+        ]:
+            np.testing.assert_allclose(df.adraw("MET_pt", sel), expected)
+        np.testing.assert_allclose(df.adraw("Jet_pt", f"{column} == 'baz'"), [11.5])
+
+    # columns with different categories
+    df["csr2"] = pd.Categorical(
+        ["foo", "baz", "baz", "qux"], categories=["baz", "foo", "qux"]
+    )
+    for sel, expected in [
+        ("sr == csr2", [46.5, 82]),
+        ("csr == csr2", [46.5, 82]),
+        ("csr2 == sr", [46.5, 82]),
+        ("csr != csr2", [30, 8.9]),
+    ]:
+        np.testing.assert_allclose(df.adraw("MET_pt", sel), expected)
+
+    # modifying the column in place invalidates its cached codes
+    df.loc[0, "sr"] = "bar"
+    np.testing.assert_allclose(df.adraw("MET_pt", "sr == 'foo'"), [8.9])
+
+
+def test_cutflow(df_jagged, tmp_path):
+    from pdroot.cutflow import iter_cutflow
+
+    cuts = ["MET_pt > 10", "length(Jet_pt) >= 1", "sr == 'foo'"]
+    cf = df_jagged.cutflow(cuts, weights="eventWeight")
+    assert list(cf.index) == ["all"] + cuts
+    assert cf["count"].tolist() == [4, 3, 2, 1]
+    assert cf["sumw"].tolist() == [3, 1, 1, -1]
+    assert cf["sumw2"].tolist() == [9, 5, 5, 1]
+    assert cf["count_nminus1"].tolist() == [1, 2, 1, 2]
+    assert cf["sumw_nminus1"].tolist() == [-1, 1, -1, 1]
+    assert df_jagged.cutflow(cuts)["sumw"].tolist() == [4, 3, 2, 1]
+    assert (df_jagged.iloc[:2].cutflow(cuts) + df_jagged.iloc[2:].cutflow(cuts)).equals(
+        df_jagged.cutflow(cuts)
+    )
+    with pytest.raises(ValueError):
+        df_jagged.cutflow(["Jet_pt > 10"])
+
+    fname = str(tmp_path / "test.parquet")
+    df_jagged.to_arrow(fname, chunksize=2)
+    cf2 = iter_cutflow(
+        fname, cuts, weights="eventWeight", progress=False, executor="threads"
+    )
+    pd.testing.assert_frame_equal(cf2, cf)
+
+    # constant cuts apply to every row
+    cf = df_jagged.cutflow(["True", "MET_pt > 10", "False"])
+    assert cf["count"].tolist() == [4, 4, 3, 0]
+    assert cf["count_nminus1"].tolist() == [0, 0, 0, 3]
+
+    # no entries
+    fname = str(tmp_path / "empty.root")
+    pd.DataFrame(dict(MET_pt=np.zeros(0))).to_root(fname, treename="t")
+    cf3 = iter_cutflow(fname, ["MET_pt > 10"], progress=False)
+    assert list(cf3.index) == ["all", "MET_pt > 10"]
+    assert (cf3.values == 0).all()
+
+
 def test_draw_custom_func(df_jagged):
     df = df_jagged
 
@@ -206,6 +458,97 @@ def test_draw_custom_func(df_jagged):
     np.testing.assert_allclose(x, x_exp)
 
 
+def _mass(pt1, eta1, phi1, m1, pt2, eta2, phi2, m2):
+    def cartesian(pt, eta, phi, m):
+        px, py, pz = pt * np.cos(phi), pt * np.sin(phi), pt * np.sinh(eta)
+        return px, py, pz, np.sqrt(px ** 2 + py ** 2 + pz ** 2 + m ** 2)
+
+    px, py, pz, e = np.add(
+        cartesian(pt1, eta1, phi1, m1), cartesian(pt2, eta2, phi2, m2)
+    )
+    return np.sqrt(e ** 2 - px ** 2 - py ** 2 - pz ** 2)
+
+
+def test_draw_p4(df_jagged):
+    from pdroot import lorentz
+
+    df = df_jagged
+    expected = [
+        _mass(42.0, -2.2, 0.1, 5.0, 15.0, 0.4, 1.5, 3.0),
+        _mass(50.0, -0.1, 3.0, 4.0, 5.0, -3.0, -3.0, 6.0),
+    ]
+    v = df.p4("Jet")
+    v = v[awkward1.num(v) >= 2]
+    np.testing.assert_allclose(lorentz.mass(v[:, 0] + v[:, 1]), expected)
+    np.testing.assert_allclose(lorentz.mass(v[:, 0], v[:, 1]), expected)
+    dphi = (3.0 - (-3.0) + np.pi) % (2 * np.pi) - np.pi
+    x = lorentz.delta_r(v[:, 0], v[:, 1])
+    np.testing.assert_allclose(x[1], np.hypot(-0.1 - (-3.0), dphi))
+    x = df.draw("mass(Jet_p4[0] + Jet_p4[1])", to_array=True)
+    np.testing.assert_allclose(x, expected)
+    x = df.draw("mass(Jet_p4[0], Jet_p4[1])", to_array=True)
+    np.testing.assert_allclose(x, expected)
+    x = df.draw("delta_r(Jet_p4[0], Jet_p4[1])", to_array=True)
+    np.testing.assert_allclose(x[1], np.hypot(-0.1 - (-3.0), dphi))
+    x = df.draw("p4sum(Jet_p4).pt", "MET_pt > 80", to_array=True)
+    np.testing.assert_allclose(x, [11.5])
+
+
+def test_combinatorics():
+    from pdroot.jagged import combinations, cartesian
+
+    def tolist(x):
+        return [row if row is not None else [] for row in x.tolist()]
+
+    np.random.seed(42)
+    counts = np.random.poisson(2.0, 100)
+    x = awkward1.unflatten(np.random.random(counts.sum()), counts)
+    x = awkward1.mask(x, np.random.random(len(x)) > 0.1)
+    y = x[::-1] * 10
+
+    a, b = combinations(x, 2)
+    pairs = awkward1.combinations(x, 2)
+    assert tolist(pairs["0"]) == a.tolist()
+    assert tolist(pairs["1"]) == b.tolist()
+
+    a, b = cartesian(x, y)
+    pairs = awkward1.cartesian([x, y])
+    assert tolist(pairs["0"]) == a.tolist()
+    assert tolist(pairs["1"]) == b.tolist()
+
+
+def test_define(df_jagged):
+    df = df_jagged.define("ht", "sum(Jet_pt[Jet_pt>40])")
+    assert "ht" not in df.columns
+    np.testing.assert_allclose(df.adraw("ht", "ht > 0"), [42, 50])
+    df = df.define("ht2", "2*ht")
+    np.testing.assert_allclose(df.adraw("ht2", "MET_pt > 40"), [84, 0])
+    np.testing.assert_allclose(df[df["MET_pt"] < 40].adraw("ht2"), [0, 100])
+    x = df_jagged.adraw("x", defines=dict(x="1+MET_pt"))
+    np.testing.assert_allclose(x, [47.5, 31, 83, 9.9])
+    with pytest.raises(ValueError):
+        df.define("MET_pt", "1")
+
+
+def test_define_threads(df_jagged):
+    import concurrent.futures
+    from pdroot.parse import to_ak_expr
+
+    # expressions with different definitions of the same name, translated at the same time
+    expr = "+".join(["x"] * 50)
+
+    def translate(i):
+        return to_ak_expr(expr, aliases=dict(x=str(i))) == " + ".join([str(i)] * 50)
+
+    def work(i):
+        x = df_jagged.adraw("x", defines=dict(x=f"MET_pt*0+{i % 7}"))
+        return (x == i % 7).all()
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(translate, range(500)))
+        assert all(executor.map(work, range(50)))
+
+
 # def test_aliases(df_jagged):
 #     df = df_jagged
 #     x = df.draw("sum((Jet_pt>40) and abs(Jet_eta)<2.4)", "MET_pt>40", to_array=True)
@@ -229,6 +572,389 @@ def test_iterdraw():
     )
     assert h.integral == df.eval(sel).sum()
 
+    h = iter_draw(
+        filename,
+        "x",
+        sel="y > 0",
+        treename=treename,
+        defines=dict(x="a+b", y="x-c"),
+        bins="10,-5,5",
+        progress=False,
+    )
+    assert h.integral == (df.eval("a+b-c") > 0).sum()
+
+
+def test_draw_cache(df_jagged, tmp_path):
+    df = df_jagged.copy()
+    cache = DrawCache(maxsize=2, path=str(tmp_path))
+    h1 = df.draw("Jet_pt", "MET_pt > 40", bins="5,0,50", cache=cache)
+    h2 = df.draw("Jet_pt", "MET_pt>40", bins="5,0,50", cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert h1 == h2
+    assert h1 is not h2
+
+    # a different binning, expression, or modified data are all misses
+    df.draw("Jet_pt", "MET_pt > 40", bins="10,0,50", cache=cache)
+    df.draw("Jet_pt", "MET_pt > 30", bins="5,0,50", cache=cache)
+    df["MET_pt"] = df["MET_pt"] - 10
+    h3 = df.draw("Jet_pt", "MET_pt > 40", bins="5,0,50", cache=cache)
+    assert cache.misses == 4
+    assert h3.integral == 1
+    assert len(cache) == 2
+
+    # evicted from memory, but persisted to disk
+    cache2 = DrawCache(path=str(tmp_path))
+    assert cache2.get(next(iter(cache._entries))) is not None
+
+    x = df.draw("MET_pt", to_array=True, cache=cache)
+    x[:] = 0
+    assert df.draw("MET_pt", to_array=True, cache=cache).sum() > 0
+
+    # an in-place modification of any element
+    df = pd.DataFrame(dict(x=np.arange(10000.0)))
+    df.draw("x", bins="10,0,20000", cache=cache)
+    df.loc[5, "x"] = 15000.0
+    h = df.draw("x", bins="10,0,20000", cache=cache)
+    assert h.counts[7] == 1
+
+
+def test_iterdraw_cache(tmp_path):
+    filename = str(tmp_path / "test.root")
+    df = pd.DataFrame(np.random.normal(0, 1, (100, 2)), columns=list("ab"))
+    df.to_root(filename, treename="t")
+    cache = DrawCache()
+    opts = dict(treename="t", bins="10,-5,5", progress=False, cache=cache)
+    h1 = iter_draw(filename, "a", "b>0", **opts)
+    h2 = iter_draw(filename, "a", "b>0", **opts)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert h1 == h2
+
+    # rewriting the file changes its UUID
+    df.head(50).to_root(filename, treename="t")
+    h3 = iter_draw(filename, "a", "b>0", **opts)
+    assert cache.misses == 2
+    assert h3.integral == (df.head(50)["b"] > 0).sum()
+
+
+def test_iterdraw_incremental(tmp_path):
+    df = pd.DataFrame(np.random.normal(0, 1, (300, 2)), columns=list("ab"))
+    for i in range(2):
+        df.iloc[100 * i : 100 * (i + 1)].to_root(
+            str(tmp_path / f"test_{i}.root"), treename="t"
+        )
+    partials = DrawCache(path=str(tmp_path / "partials"))
+    opts = dict(treename="t", bins="10,-5,5", progress=False, incremental=partials)
+    pattern = str(tmp_path / "test_*.root")
+
+    h = iter_draw(pattern, "a", "b>0", **opts)
+    assert partials.misses == 2
+    assert h.integral == (df.head(200)["b"] > 0).sum()
+
+    # only the new file is processed
+    df.iloc[200:].to_root(str(tmp_path / "test_2.root"), treename="t")
+    h = iter_draw(pattern, "a", "b>0", **opts)
+    assert (partials.hits, partials.misses) == (2, 3)
+    assert h.integral == (df["b"] > 0).sum()
+
+    # partials are persisted, and are specific to the expression
+    h = iter_draw(
+        pattern, "a", "b>0", **dict(opts, incremental=str(tmp_path / "partials"))
+    )
+    assert h.integral == (df["b"] > 0).sum()
+    h = iter_draw(pattern, "a", "b<0", **opts)
+    assert partials.misses == 6
+
+    with pytest.raises(ValueError):
+        iter_draw(pattern, "a", **dict(opts, bins=None))
+
+
+def test_iterdraw_parquet(tmp_path):
+    df = pd.DataFrame(np.random.normal(0, 1, (1000, 2)), columns=list("ab"))
+    df.to_arrow(str(tmp_path / "test.parquet"), chunksize=300)
+    h = iter_draw(str(tmp_path / "*.parquet"), "a", "b>0", progress=False)
+    assert h.integral == (df["b"] > 0).sum()
+
+
+def test_range_predicates():
+    from pdroot.parse import range_predicates
+
+    assert range_predicates("MET_pt > 300 and (run == 3) & (1 < abs(x) < 2)") == [
+        ("MET_pt", ">", 300),
+        ("run", "==", 3),
+    ]
+    assert range_predicates("-1 <= y < 2.5") == [("y", ">=", -1), ("y", "<", 2.5)]
+    assert range_predicates("(a > 1) or (b < 2)") == []
+    assert range_predicates("") == []
+
+
+def test_iterdraw_prune(tmp_path):
+    from pdroot.stats import build_stats_index
+
+    fname = str(tmp_path / "test.root")
+    df = pd.DataFrame(dict(run=np.repeat(np.arange(10), 100), x=np.arange(1000.0)))
+    df.to_root(fname, treename="t", chunksize=50)
+    build_stats_index(fname, ["run", "x"], treename="t")
+    opts = dict(
+        treename="t", bins="10,0,1000", progress=False, checkpoint=str(tmp_path)
+    )
+    h = iter_draw(fname, "x", "run == 3 and x > 320", prune=True, **opts)
+    assert h.integral == 79
+    assert sum(x["entry_stop"] - x["entry_start"] for x in h.metadata["report"]) == 100
+
+    # names of lazily-defined columns aren't used for pruning
+    h = iter_draw(fname, "x", "run > 5", prune=True, defines=dict(run="x/10"), **opts)
+    assert h.integral == 949
+
+    # every unit is pruned
+    h = iter_draw(fname, "x", "run > 20", prune=True, **opts)
+    assert h.integral == 0
+    assert h.counts.tolist() == [0] * 10
+    h = iter_draw(fname, "x", "run > 20", prune=True, **dict(opts, bins="10,0,10"))
+    assert h.integral == 0
+    with pytest.raises(ValueError):
+        iter_draw(fname, "x", "run > 20", prune=True, **dict(opts, bins=None))
+
+    # every basket has a NaN, which doesn't make it look empty
+    df.loc[::50, "x"] = np.nan
+    df.to_root(fname, treename="t", chunksize=50)
+    build_stats_index(fname, ["x"], treename="t")
+    h = iter_draw(fname, "x", "x > 320", prune=True, **dict(opts, checkpoint=None))
+    assert h.integral == (df["x"] > 320).sum()
+
+
+def test_executor_prefetch():
+    from pdroot.executors import ThreadExecutor
+
+    started = []
+    with ThreadExecutor(nworkers=2) as executor:
+        assert list(executor.map(np.square, range(10))) == [x ** 2 for x in range(10)]
+        # only a few units are started ahead of the consumer
+        results = executor.map(started.append, range(100))
+        next(results)
+        assert len(started) <= 4
+        results.close()
+
+
+def test_work_units(tmp_path):
+    df = pd.DataFrame(dict(a=np.arange(250.0)))
+    df.to_root(str(tmp_path / "test.root"), treename="t")
+    units = make_work_units(str(tmp_path / "test.root"), "t", step_size=100)
+    ranges = [(u.entry_start, u.entry_stop) for u in units]
+    assert ranges == [(0, 100), (100, 200), (200, 250)]
+    assert len(make_work_units(str(tmp_path / "test.root:t"), step_size="1MB")) == 1
+
+
+@pytest.mark.parametrize("executor", ["serial", "threads", "processes", "socket"])
+def test_iterdraw_executor(executor, tmp_path):
+    df = pd.DataFrame(np.random.normal(0, 1, (1000, 2)), columns=list("ab"))
+    df.to_root(str(tmp_path / "test.root"), treename="t")
+    if executor == "socket":
+        executor = SocketExecutor(authkey=os.urandom(16), local_workers=2)
+    for bins in ["10,-5,5", None]:
+        h = iter_draw(
+            str(tmp_path / "test.root"),
+            "a",
+            "b>0",
+            treename="t",
+            step_size=300,
+            bins=bins,
+            progress=False,
+            executor=executor,
+        )
+        assert h.integral == (df["b"] > 0).sum()
+    if not isinstance(executor, str):
+        executor.close()
+
+
+def test_socket_executor_remote_worker(tmp_path):
+    import multiprocessing
+
+    df = pd.DataFrame(np.random.normal(0, 1, (1000, 2)), columns=list("ab"))
+    df.to_root(str(tmp_path / "test.root"), treename="t")
+    # a worker started separately (as it would be on another host) connects to the executor
+    with pytest.raises(ValueError):
+        SocketExecutor(local_workers=1)
+    authkey = os.urandom(16)
+    with SocketExecutor(authkey=authkey, local_workers=0, remote_workers=1) as executor:
+        worker = multiprocessing.Process(
+            target=run_worker, args=(executor.address, authkey)
+        )
+        worker.start()
+        h = iter_draw(
+            str(tmp_path / "test.root"),
+            "a",
+            treename="t",
+            step_size=300,
+            bins="10,-5,5",
+            progress=False,
+            executor=executor,
+        )
+        assert h.integral == 1000
+
+        # errors in workers are propagated
+        with pytest.raises(RuntimeError):
+            iter_draw(
+                str(tmp_path / "test.root"),
+                "nonexistent",
+                treename="t",
+                bins="10,-5,5",
+                progress=False,
+                executor=executor,
+            )
+    worker.join(timeout=5)
+    assert worker.exitcode == 0
+
+
+def test_iterdraw_checkpoint(tmp_path):
+    df = pd.DataFrame(np.random.normal(0, 1, (200, 2)), columns=list("ab"))
+    for i in range(2):
+        df.iloc[100 * i : 100 * (i + 1)].to_root(
+            str(tmp_path / f"test_{i}.root"), treename="t"
+        )
+    with open(tmp_path / "test_2.root", "wb") as fh:
+        fh.write(b"not a root file")
+    opts = dict(
+        treename="t",
+        bins="10,-5,5",
+        step_size=50,
+        progress=False,
+        checkpoint=str(tmp_path / "ckpt"),
+    )
+    pattern = str(tmp_path / "test_*.root")
+
+    # the corrupt file stops the job, but the finished units are kept
+    with pytest.raises(Exception):
+        iter_draw(pattern, "a", "b>0", **opts)
+    h = iter_draw(pattern, "a", "b>0", on_error="skip", retries=1, **opts)
+    report = h.metadata["report"]
+    assert [x["status"] for x in report] == ["reused"] * 4 + ["failed"]
+    assert report[-1]["attempts"] == 2
+    assert h.integral == (df["b"] > 0).sum()
+
+    # resuming only reruns the unit that didn't finish
+    df.iloc[:10].to_root(str(tmp_path / "test_2.root"), treename="t")
+    h = iter_draw(pattern, "a", "b>0", **opts)
+    report = h.metadata["report"]
+    assert [x["status"] for x in report] == ["reused"] * 4 + ["done"]
+    assert h.integral == (df["b"] > 0).sum() + (df.iloc[:10]["b"] > 0).sum()
+
+    # every unit fails and is skipped
+    pattern = str(tmp_path / "bad_*.root")
+    for i in range(2):
+        with open(tmp_path / f"bad_{i}.root", "wb") as fh:
+            fh.write(b"not a root file")
+    opts = dict(opts, checkpoint=None, on_error="skip")
+    h = iter_draw(pattern, "a", **opts)
+    assert h.integral == 0
+    assert [x["status"] for x in h.metadata["report"]] == ["failed"] * 2
+    with pytest.raises(ValueError, match="bad_1.root"):
+        iter_draw(pattern, "a", **dict(opts, bins=None))
+
+
+def test_run_work_units_retries():
+    attempts = []
+
+    def flaky(unit):
+        attempts.append(unit)
+        if len(attempts) % 2 == 1:
+            raise IOError("unreadable basket")
+        return unit.entry_start
+
+    units = [WorkUnit("x.root", "t", 0, 10)]
+    assert list(run_work_units(flaky, units, retries=1)) == [0]
+    assert len(attempts) == 2
+    with pytest.raises(RuntimeError):
+        list(run_work_units(flaky, units, retries=0, on_error="raise"))
+
+
+def test_draw_server(tmp_path):
+    import stat
+    from pdroot.server import DrawServer, DrawClient, write_authkey, read_authkey
+
+    df = pd.DataFrame(np.random.normal(0, 1, (1000, 2)), columns=list("ab"))
+    df["c"] = (df["a"] > 0).astype(int)
+    df.to_root(str(tmp_path / "test.root"), treename="t")
+    df.to_arrow(str(tmp_path / "test.parquet"))
+    fnames = [str(tmp_path / "test.root"), str(tmp_path / "test.parquet")]
+    address = str(tmp_path / "server.sock")
+    with DrawServer(fnames, treename="t", address=address).start() as server:
+        assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+        keyfile = str(tmp_path / "key")
+        write_authkey(keyfile, server.authkey)
+        assert stat.S_IMODE(os.stat(keyfile).st_mode) == 0o600
+        with pytest.raises(Exception):
+            DrawClient(address, b"pdroot")
+        with DrawClient(address, read_authkey(keyfile)) as client:
+            for bins in ["10,-5,5", None]:
+                h = client.draw("a", "b>0", bins=bins)
+                assert h.integral == 2 * (df["b"] > 0).sum()
+            # branches are only read when needed
+            assert list(server.frames[0].columns) == ["a", "b"]
+            x, w = client.adraw("a", "c == 1", weights="b")
+            np.testing.assert_allclose(x, np.tile(df["a"][df["c"] == 1], 2))
+            np.testing.assert_allclose(w, np.tile(df["b"][df["c"] == 1], 2))
+            cf = client.cutflow(["a > 0", "b > 0"])
+            passing = 2 * ((df["a"] > 0) & (df["b"] > 0)).sum()
+            assert cf["count"].tolist() == [2000, 2 * df["c"].sum(), passing]
+            with pytest.raises(RuntimeError):
+                client.draw("nonexistent")
+
+
+def test_aio(tmp_path):
+    import asyncio
+    import time
+    from pdroot.aio import aiter_chunks, aiter_draw, _run_limited
+
+    df = pd.DataFrame(np.random.normal(0, 1, (1000, 2)), columns=list("ab"))
+    fname = str(tmp_path / "test.root")
+    df.to_root(fname, treename="t")
+
+    async def scans():
+        chunks = [x async for x in aiter_chunks(fname, step_size=300, columns=["a"])]
+        assert [len(x) for x in chunks] == [300, 300, 300, 100]
+        assert pd.concat(chunks)["a"].tolist() == df["a"].tolist()
+
+        # concurrent scans sharing a limit
+        limit = asyncio.Semaphore(2)
+        h1, h2 = await asyncio.gather(
+            aiter_draw(fname, "a", "b>0", step_size=100, limit=limit),
+            aiter_draw(fname, "b", bins="10,-5,5", step_size=100, limit=limit),
+        )
+        assert h1.integral == (df["b"] > 0).sum()
+        assert h2.integral == 1000
+
+        task = asyncio.ensure_future(
+            aiter_draw(fname, "a", bins="10,-5,5", step_size=10, limit=1)
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # a cancelled unit keeps its slot until its thread is done
+        active, peak = [0], [0]
+
+        def work():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            time.sleep(0.2)
+            active[0] -= 1
+
+        limit = asyncio.Semaphore(1)
+        task = asyncio.ensure_future(_run_limited(limit, None, work))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await _run_limited(limit, None, work)
+        assert peak[0] == 1
+
+        # no entries (in another file, since the cancelled units may still be reading)
+        empty = str(tmp_path / "empty.root")
+        df.iloc[:0].to_root(empty, treename="t")
+        h = await aiter_draw(empty, "a", bins="10,-5,5")
+        assert h.integral == 0
+
+    asyncio.run(scans())
+
 
 if __name__ == "__main__":
     pytest.main(["--capture=no", __file__])
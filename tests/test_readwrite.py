@@ -1,10 +1,11 @@
+import os
 import pytest
 
 import numpy as np
 import pandas as pd
 
-from pdroot import to_root, read_root, iter_chunks, ChunkDataFrame
-import fletcher
+from pdroot import to_root, read_root, to_arrow, read_arrow, iter_chunks, ChunkDataFrame
+import pyarrow
 import awkward0
 import awkward1
 
@@ -31,18 +32,61 @@ def test_pandas_injection():
     np.testing.assert_allclose(df1, df2)
 
 
+def jagged(lists):
+    return pd.arrays.ArrowExtensionArray(pyarrow.array(lists))
+
+
 def test_jagged():
-    x_in = fletcher.FletcherContinuousArray([[1.0, 2.0], [], [3.0, 4.0, 5.0]])
+    x_in = jagged([[1.0, 2.0], [], [3.0, 4.0, 5.0]])
     df = pd.DataFrame(dict(x=x_in))
     df.to_root(".test.root", compression_jagged=None)
     x_out = pd.read_root(".test.root")["x"].values
-    v_in = list(map(list, x_in.data))
-    v_out = list(map(list, x_out.data))
-    assert v_in == v_out
+    assert isinstance(x_out.dtype, pd.ArrowDtype)
+    assert x_in.tolist() == x_out.tolist()
+
+
+def test_to_root_jagged_chunks():
+    df1 = pd.DataFrame(dict(x=np.arange(10)))
+    df1["j"] = jagged([[float(i)] * (i % 3) for i in range(10)])
+    assert df1.iloc[3:6]["j"].ak(0).tolist() == [[], [4.0], [5.0, 5.0]]
+    df1.to_root(".test.root", chunksize=3)
+    df2 = read_root(".test.root")
+    assert df2["j"].ak().tolist() == df1["j"].ak().tolist()
+
+
+def test_read_root_multiple_files(tmp_path):
+    dfs = []
+    for i in range(3):
+        df = pd.DataFrame(dict(x=np.arange(10) + 10 * i, y=np.random.random(10)))
+        df["j"] = jagged([[float(i + k)] * (k % 3) for k in range(10)])
+        df.to_root(str(tmp_path / f"test{i}.root"), compression_jagged=None)
+        dfs.append(df)
+    expected = pd.concat(dfs, ignore_index=True)
+
+    df = read_root(str(tmp_path / "test*.root"), nthreads=2)
+    np.testing.assert_allclose(df[["x", "y"]], expected[["x", "y"]])
+    assert df["x"].dtype == np.int64
+    assert df["j"].ak().tolist() == expected["j"].ak().tolist()
+    # a single contiguous jagged column
+    assert df["j"].values.__arrow_array__().num_chunks == 1
+
+    # entry range over all the files
+    fnames = [str(tmp_path / f"test{i}.root:t") for i in range(3)]
+    df = read_root(fnames, columns=["x", "j"], entry_start=5, entry_stop=25)
+    assert list(df.columns) == ["x", "j"]
+    assert df["x"].tolist() == list(range(5, 25))
+    assert df["j"].ak().tolist() == expected["j"].ak()[5:25].tolist()
+
+
+def test_jagged_filter_concat():
+    df = pd.DataFrame(dict(x=jagged([[1.0, 2.0], [], [3.0, 4.0, 5.0]]), y=[1, 2, 3]))
+    df = pd.concat([df, df[df["y"] != 2]])
+    assert isinstance(df["x"].dtype, pd.ArrowDtype)
+    assert df["x"].ak().tolist() == [[1, 2], [], [3, 4, 5], [1, 2], [3, 4, 5]]
 
 
 def test_awkward_accessor():
-    x = fletcher.FletcherContinuousArray([[1.0, 2.0], [], [3.0, 4.0, 5.0]])
+    x = jagged([[1.0, 2.0], [], [3.0, 4.0, 5.0]])
     y = np.zeros(len(x), dtype=float)
     df = pd.DataFrame(dict(x=x, y=y))
     df.to_root(".test.root", compression_jagged=None)
@@ -51,6 +95,22 @@ def test_awkward_accessor():
     assert awkward1.sum(df["x"], axis=-1).tolist() == [3.0, 0.0, 12.0]
 
 
+def test_awkward_accessor_cache():
+    df = pd.DataFrame(dict(x=jagged([[1.0, 2.0], [], [3.0]]), y=[1.0, 2.0, 3.0]))
+    assert df["x"].ak() is df["x"].ak()
+    df["x"] = jagged([[1.0], [2.0], [3.0]])
+    assert df["x"].ak().tolist() == [[1.0], [2.0], [3.0]]
+    assert df.ak().tolist()[1] == dict(x=[2.0], y=2.0)
+
+
+def test_awkward_accessor_strings():
+    df = pd.DataFrame(dict(x=[1.0, 2.0, 3.0], s=pd.Categorical(["a", "b", "a"])))
+    df["o"] = ["c", "d", None]
+    assert df.ak().tolist()[1] == dict(x=2.0, s="b", o="d")
+    assert df["s"].ak().tolist() == ["a", "b", "a"]
+    assert df["o"].ak().tolist() == ["c", "d", None]
+
+
 def test_p4_accessor():
     N = 10
     df = pd.DataFrame(
@@ -61,11 +121,14 @@ def test_p4_accessor():
             Jet_mass=np.zeros(N) + 10.0,
         )
     )
-    np.testing.assert_allclose(df.p4("Jet").pt, df["Jet_pt"])
+    p4 = df.p4("Jet")
+    np.testing.assert_allclose(p4.pt, df["Jet_pt"])
+    # two identical vectors: twice the mass
+    np.testing.assert_allclose((p4 + p4).mass, 2 * df["Jet_mass"])
 
 
 def test_chunkdataframe():
-    x = fletcher.FletcherContinuousArray(100 * [[1.0, 2.0], [], [3.0, 4.0, 5.0]])
+    x = jagged(100 * [[1.0, 2.0], [], [3.0, 4.0, 5.0]])
     y = np.arange(len(x), dtype=float)
     df = pd.DataFrame(dict(x=x, y=y))
     df.to_root(".test.root", compression_jagged=None)
@@ -78,7 +141,7 @@ def test_chunkdataframe():
 
 
 def test_chunkdataframe_subset():
-    x = fletcher.FletcherContinuousArray(100 * [[1.0, 2.0], [], [3.0, 4.0, 5.0]])
+    x = jagged(100 * [[1.0, 2.0], [], [3.0, 4.0, 5.0]])
     y = np.arange(len(x), dtype=float)
     df = pd.DataFrame(dict(x=x, y=y))
     df.to_root(".test.root", compression_jagged=None)
@@ -95,6 +158,16 @@ def test_chunkdataframe_subset():
     assert (df["y"] == y[myslice]).all()
 
 
+def test_to_root_define():
+    x = jagged([[1.0, 2.0], [], [3.0, 4.0, 5.0]])
+    df = pd.DataFrame(dict(x=x, y=[1.0, 2.0, 3.0]))
+    df = df.define("z", "sum(x) + y").define("w", "x[x > 1.5]")
+    df.to_root(".test.root", chunksize=2)
+    df = pd.read_root(".test.root")
+    assert df["z"].tolist() == [4.0, 2.0, 15.0]
+    assert df["w"].ak().tolist() == [[2.0], [], [3.0, 4.0, 5.0]]
+
+
 def test_iter_chunks():
     N = 1000
     df1 = pd.DataFrame(
@@ -116,5 +189,124 @@ def test_iter_chunks():
     assert len(chunks[0].columns) == len(columns)
 
 
+@pytest.mark.parametrize("executor", ["serial", "threads", "processes", "socket"])
+def test_iter_chunks_executor(executor, tmp_path):
+    from pdroot.executors import SocketExecutor
+
+    N = 1000
+    df1 = pd.DataFrame(dict(b1=np.arange(N), b2=np.random.random(N)))
+    for i in range(2):
+        to_root(df1, str(tmp_path / f"test_{i}.root"))
+
+    if executor == "socket":
+        executor = SocketExecutor(authkey=os.urandom(16), local_workers=2)
+    chunks = list(
+        iter_chunks(
+            str(tmp_path / "test_*.root"),
+            columns=["b1"],
+            progress=False,
+            step_size=N // 4,
+            executor=executor,
+        )
+    )
+    if not isinstance(executor, str):
+        executor.close()
+    assert len(chunks) == 8
+    assert list(chunks[0].columns) == ["b1"]
+    np.testing.assert_equal(pd.concat(chunks)["b1"].values, np.tile(np.arange(N), 2))
+
+
+@pytest.mark.parametrize("ext", ["parquet", "arrow"])
+def test_arrow_roundtrip(ext, tmp_path):
+    fname = str(tmp_path / f"test.{ext}")
+    df1 = pd.DataFrame(dict(x=np.arange(5.0), s=list("abcde"), t=list("axcxe")))
+    df1["n"] = [1.0, np.nan, 5.0, np.nan, 2.0]
+    df1["j"] = jagged([[1.0, 2.0], [], [3.0], [4.0, 5.0, 6.0], [7.0]])
+    df1.to_arrow(fname, chunksize=2)
+
+    df2 = pd.read_arrow(fname)
+    assert df2["x"].dtype == np.float64
+    assert df2["n"].dtype == np.float64
+    np.testing.assert_array_equal(df2["n"], df1["n"])
+    assert df2.draw("n", "n != 5", bins="5,0,5").integral == 4
+    assert df2["s"].tolist() == list("abcde")
+    assert df2["s"].dtype == object
+    assert df2.draw("x", "s in ['b', 'd']", to_array=True).tolist() == [1, 3]
+    assert (df2["s"] == df2["t"]).tolist() == [True, False, True, False, True]
+    assert df2.draw("x", "s == t", to_array=True).tolist() == [0, 2, 4]
+    assert df2.ak()["s"].tolist() == list("abcde")
+    assert df2["j"].ak().tolist() == df1["j"].ak().tolist()
+    assert df2.draw("sum(j)", to_array=True).tolist() == [3, 0, 3, 15, 7]
+
+    # entry ranges spanning row groups, and column projection
+    df3 = read_arrow(fname, columns=["j"], entry_start=1, entry_stop=4)
+    assert list(df3.columns) == ["j"]
+    assert df3["j"].ak().tolist() == [[], [3.0], [4.0, 5.0, 6.0]]
+    assert len(read_arrow(fname, entry_start=10)) == 0
+
+    chunks = list(iter_chunks(fname, columns=["x"], progress=False))
+    assert len(chunks) == 3
+    assert pd.concat(chunks)["x"].tolist() == df1["x"].tolist()
+
+    df4 = ChunkDataFrame(filename=fname, entry_start=2, entry_stop=5)
+    assert df4["j"].ak().tolist() == [[3.0], [4.0, 5.0, 6.0], [7.0]]
+    assert df4["x"].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_stats_prune(tmp_path):
+    from pdroot.stats import build_stats_index
+
+    fname = str(tmp_path / "test.root")
+    N = 1000
+    df1 = pd.DataFrame(dict(run=np.repeat(np.arange(10), N // 10), x=np.arange(N)))
+    df1["j"] = jagged([[float(i)] * (i % 3) for i in range(N)])
+    df1.to_root(fname, chunksize=50)
+
+    # no index yet, so nothing is skipped
+    assert len(read_root(fname, prune="run == 3")) == N
+
+    build_stats_index(fname, ["run", "x", "j"])
+    df2 = read_root(fname, prune="run == 3")
+    assert df2["run"].tolist() == [3] * 100
+    df2 = read_root(fname, prune="(x >= 120) & (x < 180) and j > 150")
+    assert df2["x"].tolist() == list(range(150, 200))
+    assert len(read_root(fname, prune="run > 20")) == 0
+    assert len(read_root(fname, prune="run > 2 or x < 0")) == N
+
+    chunks = list(iter_chunks(fname, progress=False, step_size=300, prune="run == 3"))
+    assert [len(x) for x in chunks] == [100]
+
+    # a stale index is ignored
+    df1.head(500).to_root(fname, chunksize=50)
+    assert len(read_root(fname, prune="run == 3")) == 500
+
+
+def test_parquet_prune(tmp_path):
+    fname = str(tmp_path / "test.parquet")
+    df1 = pd.DataFrame(dict(x=np.arange(1000.0)))
+    df1.to_arrow(fname, chunksize=100)
+    chunks = list(iter_chunks(fname, progress=False, prune="x > 850"))
+    assert [len(x) for x in chunks] == [100, 100]
+
+
+def test_lazy_import():
+    import sys
+    import subprocess
+
+    code = (
+        "import sys, time; import pandas; t0 = time.time(); import pdroot; "
+        "print(time.time() - t0); "
+        "print([m for m in ['uproot', 'uproot3', 'awkward0', 'awkward1', 'yahist', 'tqdm'] "
+        "if m in sys.modules])"
+    )
+    out = subprocess.check_output([sys.executable, "-c", code]).decode().splitlines()
+    assert float(out[0]) < 0.2
+    assert out[1] == "[]"
+
+    df = pd.DataFrame(dict(x=np.arange(10)))
+    df.to_root(".test.root", compression="lz4")
+    assert read_root(".test.root")["x"].tolist() == list(range(10))
+
+
 if __name__ == "__main__":
     pytest.main(["--capture=no", __file__])